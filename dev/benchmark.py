@@ -0,0 +1,125 @@
+# measure the end-to-end throughput of pymw against a local FakeWikiServer
+#
+# usage: python dev/benchmark.py [--scale N] [--repeat N] [--output FILE]
+#                                [--compare BASELINE] [names ...]
+#
+# The results are written as JSON. For each benchmark the fastest of
+# `--repeat` runs is reported. Pass the output of a previous run as
+# `--compare` to print the relative change of items per second.
+import sys
+from argparse import ArgumentParser
+from io import BytesIO
+from json import dump, load
+from pathlib import Path
+from platform import python_implementation, python_version
+from time import perf_counter
+
+root = Path(__file__).parent.parent
+sys.path[:0] = [str(root), str(root / 'test')]
+
+from fakewiki import FakeWikiServer  # noqa: E402
+from pymw import API, __version__  # noqa: E402
+
+
+def post_and_continue(api, wiki, scale):
+    wiki.page_count = 50_000 * scale
+    items = 0
+    for json in api.post_and_continue({
+        'action': 'query', 'list': 'allpages', 'aplimit': 'max'
+    }):
+        items += len(json['query']['allpages'])
+    return items
+
+
+def list_(api, wiki, scale):
+    wiki.page_count = 50_000 * scale
+    return sum(1 for _ in api.list('allpages', {'aplimit': 'max'}))
+
+
+def prop_batches(api, wiki, scale):
+    # each batch of 50 titles spans 20 continued responses
+    wiki.categories_per_page = 20
+    return sum(len(page['categories']) for page in api.prop('categories', {
+        'titles': [f'P{i}' for i in range(1000 * scale)], 'cllimit': 50}))
+
+
+def chunk_limited_param(api, wiki, scale):
+    # 100k titles are split into chunks of `api.limit`
+    return sum(1 for _ in api.prop('info', {
+        'titles': [f'P{i}' for i in range(100_000 * scale)]}))
+
+
+def upload_chunks(api, wiki, scale):
+    # items are uploaded bytes
+    api._user = 'Benchmark'
+    chunk = bytes(range(256)) * 1024  # 256 KiB
+    count = 32 * scale
+    api.upload_chunks(
+        chunks=(BytesIO(chunk) for _ in range(count)), filename='B.bin',
+        filesize=len(chunk) * count)
+    return len(chunk) * count
+
+
+BENCHMARKS = {
+    'post_and_continue': post_and_continue,
+    'list': list_,
+    'prop_batches': prop_batches,
+    'chunk_limited_param': chunk_limited_param,
+    'upload_chunks': upload_chunks,
+}
+
+
+def run(benchmark, scale: int, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        with FakeWikiServer() as server, API(server.url) as api:
+            start = perf_counter()
+            items = benchmark(api, server.wiki, scale)
+            seconds = perf_counter() - start
+            requests = len(server.wiki.requests)
+        if best is None or seconds < best['seconds']:
+            best = {
+                'seconds': seconds, 'requests': requests, 'items': items,
+                'requests_per_second': requests / seconds,
+                'items_per_second': items / seconds}
+    return best
+
+
+def compare(results: dict, baseline: dict) -> None:
+    for name, result in results.items():
+        if (base := baseline['results'].get(name)) is None:
+            continue
+        change = result['items_per_second'] / base['items_per_second'] - 1
+        print(f'{name:<24}{change:+.1%}', file=sys.stderr)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('names', nargs='*', help=', '.join(BENCHMARKS))
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--compare', type=Path)
+    args = parser.parse_args()
+    if unknown := {*args.names} - BENCHMARKS.keys():
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+    results = {
+        name: run(BENCHMARKS[name], args.scale, args.repeat)
+        for name in (args.names or BENCHMARKS)}
+    report = {
+        'pymw': __version__,
+        'python': f'{python_implementation()} {python_version()}',
+        'scale': args.scale, 'repeat': args.repeat, 'results': results}
+    if args.output is None:
+        dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with args.output.open('w') as f:
+            dump(report, f, indent=1)
+    if args.compare is not None:
+        with args.compare.open() as f:
+            compare(results, load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,17 @@
-from ._api import API, APIError, LoginError, PYMWError, __version__, \
-    ACTION_PARAM_TOKEN, LOGIN_REQUIRED_ACTIONS, LIMITED_PARAMS
+from ._api import API, APIError, AdaptiveLimit, Checkpoint, LoginError, \
+    PYMWError, __version__, ACTION_PARAM_TOKEN, LOGIN_REQUIRED_ACTIONS, \
+    LIMITED_PARAMS, key_ranges, record_type, time_windows
+from ._sinks import write_csv, write_ndjson, write_parquet
+from ._store import ContentDir, RevisionStore, revision_slots
+from ._mirror import PageMirror
+from ._feed import RecentChangesFeed
+from ._titles import TitleNormalizer
+from ._edit import StashedEdit, TokenBucket, bulk_edit, stash_edit
+from ._upload import bulk_upload, file_sha1, upload_path
+from ._download import download, download_files
+from ._hooks import Hooks, Metrics
+from ._transport import HTTPXTransport, HedgedTransport, Recorder, \
+    Replayer
+from ._breaker import CircuitBreaker, CircuitBreakerTransport, \
+    CircuitOpenError, add_circuit_breaker
+from ._pipeline import pipeline
@@ -1,17 +1,26 @@
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from fnmatch import fnmatch
 from functools import lru_cache, partial
 from itertools import islice, chain
-from json import load as json_load
-from logging import warning, debug, info
+from json import dump as json_dump, load as json_load
+from logging import DEBUG, debug, info, root, warning
 from pathlib import Path
 from pprint import pformat
-from time import sleep
-from typing import Any, BinaryIO, Generator, Iterable, Iterator, Literal, \
-    Optional, \
-    Union
+from queue import Empty, Queue
+from time import monotonic, perf_counter, sleep
+from typing import Any, BinaryIO, Callable, Generator, Iterable, Iterator, \
+    Literal, Optional, Union
+
+from urllib.parse import urlencode
 
 from requests import Session, Response
 
+from ._hooks import Hooks
+from ._store import ContentDir, RevisionStore
+
 __version__ = '0.9.2.dev0'
 
 
@@ -170,6 +179,9 @@ LIMITED_PARAMS = MissingDict(lambda _: frozenset(), (
 ))
 
 
+_SHARD_DONE = object()
+
+
 class PYMWError(RuntimeError):
     __slots__ = ()
     pass
@@ -177,7 +189,14 @@ class PYMWError(RuntimeError):
 
 class APIError(PYMWError):
     __slots__ = ()
-    pass
+
+    @property
+    def code(self) -> Optional[str]:
+        """The code of the first error, if any."""
+        try:
+            return self.args[0][0]['code']
+        except (IndexError, KeyError, TypeError):
+            return None
 
 
 class LoginError(APIError):
@@ -196,6 +215,169 @@ class TooManyValuesError(APIError):
         return self.error[item]
 
 
+class Checkpoint:
+    """Serializable continuation state of a `post_and_continue` chain.
+
+    Pass an instance as the `checkpoint` argument of `post_and_continue`,
+    `query`, `list`, or `prop` to have it updated after each consumed
+    response, and pass it again, with the same params, to resume the chain.
+
+    The position in a limited parameter, e.g. `titles`, that is split into
+    chunks of `API.limit` values is saved as an offset, so a chain can be
+    resumed even if `API.limit` has changed, e.g. after login or after a
+    `toomanyvalues` error.
+
+    :param offset: Number of values of the limited parameter whose chunks are
+        done. A request without a limited parameter counts as one value.
+    :param continue_: The `continue` dict to be merged into the next request.
+    :param path: A JSON file to auto-save the state into.
+    :param interval: Minimum number of seconds between auto-saves.
+    """
+    __slots__ = 'offset', 'continue_', 'path', 'interval', 'pending', \
+        '_saved_at'
+
+    def __init__(
+        self, offset: int = 0, continue_: dict = None, *,
+        path: Union[str, Path] = None, interval: float = 60.,
+    ) -> None:
+        self.offset = offset
+        self.continue_ = continue_
+        self.path = None if path is None else Path(path)
+        self.interval = interval
+        self.pending = offset, continue_
+        self._saved_at = monotonic()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.offset!r}, {self.continue_!r})'
+
+    @classmethod
+    def load(
+        cls, path: Union[str, Path], interval: float = 60.
+    ) -> 'Checkpoint':
+        """Load a checkpoint from `path` or create a new one."""
+        try:
+            with Path(path).open(encoding='utf8') as f:
+                state = json_load(f)
+        except FileNotFoundError:
+            return cls(path=path, interval=interval)
+        return cls(
+            state['offset'], state['continue'], path=path, interval=interval)
+
+    def to_dict(self) -> dict:
+        return {'offset': self.offset, 'continue': self.continue_}
+
+    def save(self) -> None:
+        """Atomically write the state into `self.path`, if any."""
+        if (path := self.path) is None:
+            return
+        tmp = path.with_name(path.name + '.tmp')
+        with tmp.open('w', encoding='utf8') as f:
+            json_dump(self.to_dict(), f)
+        tmp.replace(path)
+        self._saved_at = monotonic()
+
+    def update(self, offset: int, continue_: Optional[dict]) -> None:
+        self.offset, self.continue_ = offset, continue_
+        if monotonic() - self._saved_at >= self.interval:
+            self.save()
+
+
+class AdaptiveLimit:
+    """Adjust a limit parameter to keep responses close to a target latency.
+
+    Pass an instance as the `adaptive` argument of `post_and_continue` or
+    `list` to change the limit between continuation requests. The limit
+    grows or shrinks at most twofold per request.
+
+    :param param: The limit parameter of the module, e.g. 'rvlimit'. If the
+        parameter is not set, 'max' is used for the first request.
+    :param target_latency: The desired response time in seconds.
+    :param maximum: The highest limit to use. If not given, it is read from
+        the `limits` of the response to a `param=max` request. Without either
+        the limit will never grow over its initial value.
+    :param max_size: The maximum desired response size in bytes.
+    :param minimum: The lowest limit to use.
+    """
+    __slots__ = 'param', 'target_latency', 'maximum', 'max_size', 'minimum', \
+        'limit'
+
+    def __init__(
+        self, param: str, target_latency: float = 1., *,
+        maximum: int = None, max_size: int = None, minimum: int = 1,
+    ) -> None:
+        self.param = param
+        self.target_latency = target_latency
+        self.maximum = maximum
+        self.max_size = max_size
+        self.minimum = minimum
+        self.limit: Optional[int] = None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.param!r}, limit={self.limit!r})'
+
+    def prepare(self, data: dict) -> None:
+        if (value := data.setdefault(self.param, 'max')) != 'max':
+            self.limit = limit = int(value)
+            if self.maximum is None:
+                self.maximum = limit
+
+    def update(
+        self, data: dict, json: dict, latency: float, size: int = None
+    ) -> None:
+        """Set the limit of the next request in `data`."""
+        if (limit := self.limit) is None:  # 'max' was used
+            if (limits := json.get('limits')) is None:
+                return  # keep using 'max'
+            limit = max(limits.values())
+            if self.maximum is None:
+                self.maximum = limit
+        factor = self.target_latency / latency if latency else 2.
+        if size and self.max_size:
+            factor = min(factor, self.max_size / size)
+        limit = int(limit * min(max(factor, .5), 2.))
+        data[self.param] = self.limit = \
+            min(max(limit, self.minimum), self.maximum)
+
+
+_FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+class _FormEncoder(dict):
+    """A cache of url-encoded `key=value` pairs keyed by parameter names.
+
+    A cached pair is reused as long as the str value is the same object,
+    therefore the unchanged values of a continued request, e.g. a long
+    `titles` value, are only encoded once per chain.
+    """
+    __slots__ = ()
+
+    def __call__(self, data: dict) -> str:
+        pairs = []
+        append = pairs.append
+        get = self.get
+        for k, v in data.items():
+            if v is None:  # same as requests
+                continue
+            if type(v) is not str:
+                append(urlencode(((k, v),), doseq=not isinstance(
+                    v, (bytes, int, float)) and hasattr(v, '__iter__')))
+                continue
+            if (cached := get(k)) is None or cached[0] is not v:
+                cached = self[k] = v, urlencode(((k, v),))
+            append(cached[1])
+        return '&'.join(pairs)
+
+
+def _request_form(
+    request: callable, url: str, encode: _FormEncoder, /, *, data: dict,
+    params: dict = None, files: dict = None,
+) -> Response:
+    if files is not None:  # multipart/form-data
+        return request('POST', url, params=params, data=data, files=files)
+    return request(
+        'POST', url, params=params, data=encode(data), headers=_FORM_HEADERS)
+
+
 class TokenManager(dict):
 
     def __init__(self, api: 'API'):
@@ -203,15 +385,20 @@ class TokenManager(dict):
         super().__init__()
 
     def __missing__(self, token_type) -> str:
-        v = self[token_type] = self.api.meta(
+        start = perf_counter()
+        v = self[token_type] = (api := self.api).meta(
             'tokens', {'type': token_type})[f'{token_type}token']
+        if (hooks := api.hooks) is not None:
+            hooks.emit(
+                'token', api=api, token_type=token_type,
+                elapsed=perf_counter() - start)
         return v
 
 
 # noinspection PyShadowingBuiltins
 class API:
     __slots__ = '_url', 'session', 'maxlag', 'tokens', '_user', '_post', \
-        'last_response', 'limit'
+        'last_response', 'limit', 'title_normalizer', 'hooks'
 
     def __enter__(self) -> 'API':
         return self
@@ -221,6 +408,7 @@ class API:
 
     def __init__(
         self, url: str, user_agent: str = None, maxlag: int = 5,
+        transport: Callable[..., Response] = None,
     ) -> None:
         """Initialize API object.
 
@@ -233,8 +421,11 @@ class API:
             used, however that does not fully meet MediaWiki's API etiquette:
             https://www.mediawiki.org/wiki/API:Etiquette#The_User-Agent_header
             See also: https://meta.wikimedia.org/wiki/User-Agent_policy
+        :param transport: See `self.transport`. By default requests are
+            posted to `url` using `self.session`.
         """
-        self.last_response = self._user = None
+        self.last_response = self._user = self.title_normalizer = \
+            self.hooks = None
         self.limit = 50
         self.maxlag = maxlag
         s = self.session = Session()
@@ -242,11 +433,26 @@ class API:
             f'mwpy/{__version__}' if user_agent is None else user_agent
         self.tokens = TokenManager(self)
         self._url = url
-        self._post = partial(s.request, 'POST', url)
+        self._post = partial(_request_form, s.request, url, _FormEncoder()) \
+            if transport is None else transport
 
     def __repr__(self):
         return f'{type(self).__name__}({self._url!r})'
 
+    @property
+    def transport(self) -> Callable[..., Response]:
+        """The callable that sends the requests of `self.post`.
+
+        It is called with `data`, `params`, and `files` keyword arguments
+        and should return a `requests.Response`-like object. Replace it to
+        wrap or swap the HTTP layer, e.g. with a `Recorder` or a `Replayer`.
+        """
+        return self._post
+
+    @transport.setter
+    def transport(self, transport: Callable[..., Response]) -> None:
+        self._post = transport
+
     def _handle_api_errors(
         self, data: dict, resp: Response, json: dict
     ) -> dict:
@@ -260,6 +466,8 @@ class API:
                 # noinspection PyUnboundLocalVariable
                 # todo: what if there is more than one error?
                 return handler_result
+        if (hooks := self.hooks) is not None:
+            hooks.emit('api_error', api=self, data=data, errors=errors)
         raise APIError(errors)
 
     def _handle_badtoken_error(
@@ -267,12 +475,15 @@ class API:
     ) -> None:
         param, token_type = ACTION_PARAM_TOKEN[error['module']]
         info(f'invalidating {token_type} token cache')
-        del self.tokens[token_type]
+        # concurrent requests may have already invalidated it
+        self.tokens.pop(token_type, None)
 
     def _handle_login_required_error(
         self, _: Response, data: dict, __: dict
     ):
         warning('"login-required" error occurred; trying to login...')
+        if (hooks := self.hooks) is not None:
+            hooks.emit('retry', api=self, data=data, code='login-required')
         self.login()
         return self.post(data)
 
@@ -281,6 +492,10 @@ class API:
     ) -> dict:
         retry_after = resp.headers['retry-after']
         warning(f'maxlag error (retrying after {retry_after} seconds)')
+        if (hooks := self.hooks) is not None:
+            hooks.emit(
+                'retry', api=self, data=data, code='maxlag',
+                delay=int(retry_after))
         sleep(int(retry_after))
         return self.post(data)
 
@@ -288,6 +503,8 @@ class API:
         self, _: Response, data: dict, __: dict
     ):
         warning('"notloggedin" error occurred; trying to login...')
+        if (hooks := self.hooks) is not None:
+            hooks.emit('retry', api=self, data=data, code='notloggedin')
         self.login()
         data.pop(ACTION_PARAM_TOKEN[data.get('action')][0], None)
         return self.post(data)
@@ -325,6 +542,8 @@ class API:
         json = self.post(params)
         login = json['login']
         result = login['result']
+        if (hooks := self.hooks) is not None:
+            hooks.emit('login', api=self, lgname=lgname, result=result)
         if result == 'Success':
             self.tokens.clear()
             # lgusername == lgname.partition('@')[0]
@@ -379,26 +598,48 @@ class API:
         maxlag=self.maxlag.
         Warn about warnings and raise errors as APIError.
         """
-        data |= {
-            'format': 'json',
-            'formatversion': '2',
-            'errorformat': 'plaintext',
-            'maxlag': self.maxlag}
+        data['format'] = 'json'
+        data['formatversion'] = '2'
+        data['errorformat'] = 'plaintext'
+        data['maxlag'] = self.maxlag
         self._prepare_action(data)
         self._pipe_join_values(data)
         if self._user is not None:
             data['assertuser'] = self._user
-        debug('data:\n\t%s\nfiles:\n\t%s', data, files)
-        self.last_response = resp = self._post(
-            params=params, data=data, files=files)
+        if debugging := root.isEnabledFor(DEBUG):
+            debug('data:\n\t%s\nfiles:\n\t%s', data, files)
+        if (hooks := self.hooks) is None:
+            resp = self._post(params=params, data=data, files=files)
+        else:
+            resp = self._hooked_post(hooks, data, params, files)
+        self.last_response = resp
         json = resp.json()
-        debug('resp.json:\n\t%s', json)
+        if debugging:
+            debug('resp.json:\n\t%s', json)
         if 'warnings' in json:
             warning(pformat(json['warnings']))
         if 'errors' in json:
             return self._handle_api_errors(data, resp, json)
         return json
 
+    def _hooked_post(
+        self, hooks: 'Hooks', data: dict, params: Optional[dict],
+        files: Optional[dict],
+    ) -> Response:
+        hooks.emit('request_start', api=self, data=data)
+        start = perf_counter()
+        try:
+            resp = self._post(params=params, data=data, files=files)
+        except Exception as e:
+            hooks.emit(
+                'request_end', api=self, data=data, response=None,
+                elapsed=perf_counter() - start, error=e)
+            raise
+        hooks.emit(
+            'request_end', api=self, data=data, response=resp,
+            elapsed=perf_counter() - start, error=None)
+        return resp
+
     def _handle_too_many_values_error(self, e, data):
         param = (text := e['text'])[  # T258469
             (start := (find := text.find)('"') + 1):find('"', start)]
@@ -414,81 +655,361 @@ class API:
             data[param] = param_values[i:i + limit]
             yield from self.post_and_continue(data)
 
-    def _chunk_value(self, value: Iterable, /):
+    def _chunk_value(self, value: Iterable, offset: int = 0, /):
         if not value:  # e.g. None or ''
             return
         if isinstance(value, str):
             value = value.split('|')
         values = iter(value)
+        if offset:
+            values = islice(values, offset, None)
         while chunk := (*islice(values, self.limit),):
             yield chunk
 
-    def _chunk_limited_param(self, data: dict, /):
+    def _chunk_limited_param(self, data: dict, offset: int = 0, /):
+        """Yield `(data, count)` for each chunk of the limited parameter.
+
+        `count` is the number of values in the chunk. The first `offset`
+        values are skipped. See `Checkpoint` for requests without a limited
+        parameter.
+        """
+        if (normalize := self.title_normalizer) is not None and \
+                (titles := data.get('titles')):
+            if isinstance(titles, str):
+                titles = titles.split('|')
+            data['titles'] = _unique(map(normalize, titles))
         append_violating = (violating_params := []).append
+        fitting = {}
         for param in LIMITED_PARAMS[data.get('action')] & data.keys():
             chunks = self._chunk_value(data[param])
             if (chunk1 := next(chunks, None)) is None:
                 del data[param]  # empty limited param
                 continue
             if (chunk2 := next(chunks, None)) is None:
-                data[param] = chunk1  # all data can fit into one chunk
+                # all data can fit into one chunk
+                data[param] = fitting[param] = chunk1
                 continue
             append_violating(param)
             # make sure no data is lost from the param value
             data[param] = chain(chunk1, chunk2, chain.from_iterable(chunks))
-        if len(violating_params) != 1:
-            yield data  # leave it for the API to handle or raise
+        if violating_params:
+            if len(violating_params) != 1:
+                if not offset:
+                    yield data, 1  # leave it for the API to handle or raise
+                return
+            param = violating_params[0]
+        elif fitting:
+            # the param that would be chunked with a lower limit
+            param = max(sorted(fitting), key=lambda p: len(fitting[p]))
+        else:
+            if not offset:
+                yield data, 1
             return
-        for chunk in self._chunk_value(data[(param := violating_params[0])]):
+        for chunk in self._chunk_value(data[param], offset):
             data[param] = chunk
-            yield data
-
-    def post_and_continue(self, data: dict) -> Generator[dict, None, None]:
-        """Yield and continue post results until all the data is consumed."""
+            yield data, len(chunk)
+
+    def post_and_continue(
+        self, data: dict, *, checkpoint: Checkpoint = None,
+        adaptive: AdaptiveLimit = None, content_dir: ContentDir = None,
+        revision_store: RevisionStore = None,
+    ) -> Generator[dict, None, None]:
+        """Yield and continue post results until all the data is consumed.
+
+        :param checkpoint: Resume from, and keep updating, this checkpoint.
+            The checkpoint is updated after the consumer has requested the
+            next response, i.e. a resumed chain will repeat the last response
+            that had been yielded before the interruption.
+        :param adaptive: Adjust the limit parameter of the module between
+            requests according to the measured response times.
+        :param content_dir: Move revision contents of each response into
+            this directory before yielding it.
+        :param revision_store: Write revision contents of each response into
+            this store.
+        """
         if 'rawcontinue' in data:
             raise NotImplementedError(
                 'rawcontinue is not implemented for query method')
-        prev_continue = None
-        for data in self._chunk_limited_param(data):
+        if adaptive is not None:
+            adaptive.prepare(data)
+        offset, prev_continue = (0, None) if checkpoint is None else (
+            checkpoint.offset, checkpoint.continue_)
+        for data, count in self._chunk_limited_param(data, offset):
+            if prev_continue is not None:
+                data |= prev_continue
+            depth = 0
             while True:
+                depth += 1
+                start = perf_counter()
                 try:
                     json = self.post(data)
                 except TooManyValuesError as e:
                     yield from self._handle_too_many_values_error(e, data)
                     break
-                yield json
-                if (continue_ := json.get('continue')) is None:
+                if adaptive is not None:
+                    adaptive.update(
+                        data, json, perf_counter() - start,
+                        adaptive.max_size and len(self.last_response.content))
+                if revision_store is not None:
+                    revision_store.add(json)
+                if content_dir is not None:
+                    content_dir.offload(json)
+                continue_ = json.get('continue')
+                if checkpoint is None:
+                    yield json
+                else:
+                    checkpoint.pending = state = (
+                        (offset + count, None) if continue_ is None
+                        else (offset, continue_))
+                    yield json
+                    checkpoint.update(*state)
+                if continue_ is None:
+                    if (hooks := self.hooks) is not None:
+                        hooks.emit(
+                            'continuation', api=self, data=data, depth=depth)
+                    # Do not send stale continue keys with the next chunk.
+                    if prev_continue is not None:
+                        for k in prev_continue:
+                            del data[k]
+                        prev_continue = None
                     break
-                if prev_continue is None:
-                    data |= (prev_continue := continue_)
-                    continue
                 # Remove or update any prev_continue key in data.
-                for k in prev_continue.keys() - continue_.keys():
-                    del data[k]
+                if prev_continue is not None:
+                    for k in prev_continue.keys() - continue_.keys():
+                        del data[k]
                 data |= (prev_continue := continue_)
+            offset += count
+        if checkpoint is not None:
+            checkpoint.save()
 
-    def query(self, params: dict) -> Generator[dict, None, None]:
+    def query(self, params: dict, **kwargs) -> Generator[dict, None, None]:
         """Post an API query and yield results.
 
         Handle continuations.
         `self.query_list`, `self.query_meta`, and `self.query_prop` should
         be preferred to this method.
+        `kwargs` are passed to `self.post_and_continue`.
 
         https://www.mediawiki.org/wiki/API:Query
         """
         params['action'] = 'query'
-        yield from self.post_and_continue(params)
+        yield from self.post_and_continue(params, **kwargs)
 
-    def list(self, list: str, params: dict) -> Generator[dict, None, None]:
+    def list(
+        self, list: str, params: dict, **kwargs
+    ) -> Generator[dict, None, None]:
         """Post a list query and yield the results.
 
+        `kwargs` are passed to `self.post_and_continue`.
+
         https://www.mediawiki.org/wiki/API:Lists
         """
+        for json in self._list_json(list, params, **kwargs):
+            yield from json['query'][list]
+
+    def sharded_list(
+        self, list: str, params: dict, shards: Iterable[dict],
+        max_workers: int = None, buffer_size: int = 1000,
+    ) -> Generator[tuple[int, dict], None, None]:
+        """Crawl the shards of a list query concurrently and yield results.
+
+        Each shard is a dict of range parameters, e.g. one generated by
+        `key_ranges` or `time_windows`, that is merged into a copy of
+        `params` and then crawled using `self.list` in a separate thread.
+
+        Yield `(shard_index, item)` tuples. Items of each shard are yielded
+        in their original order, but the shards are interleaved.
+        Completion of each shard is logged at INFO level.
+
+        If the `{prefix}to` of a shard is the `{prefix}from` of the next one,
+        as in `key_ranges`, an item on that boundary is returned by both of
+        them. It is yielded only once, as the first item of the next shard.
+        For this, the latest item of such a shard is held back until the next
+        one arrives.
+
+        :param max_workers: Maximum number of shards to crawl at the same
+            time. Defaults to the number of shards.
+        :param buffer_size: Maximum number of fetched items that are waiting
+            to be consumed. Workers block when the buffer is full.
+        """
+        shards = [*shards]
+        queue = Queue(buffer_size)
+        put, get = queue.put, queue.get
+        stopped = False
+
+        def crawl(i: int, shard: dict):
+            count = 0
+            try:
+                for item in self.list(list, params | shard):
+                    if stopped:
+                        return
+                    put((i, item))
+                    count += 1
+            except Exception as e:
+                put((i, e))
+                return
+            info(f'shard {i} of {list} is complete ({count} items)')
+            put((i, _SHARD_DONE))
+
+        # shards whose last item may be the first item of the next shard
+        adjacent = {
+            i for i in range(len(shards) - 1)
+            if _adjacent(shards[i], shards[i + 1])}
+        held = {}  # the latest item of each adjacent shard
+        lasts = {}  # the last item of each completed adjacent shard
+        firsts = {}  # the first item of each shard after an adjacent one
+
+        executor = ThreadPoolExecutor(max_workers or len(shards) or 1)
+        futures = [executor.submit(crawl, i, s) for i, s in enumerate(shards)]
+        remaining = len(shards)
+        try:
+            while remaining:
+                i, item = get()
+                if item is _SHARD_DONE:
+                    remaining -= 1
+                    if i in adjacent:
+                        lasts[i] = held.pop(i, None)
+                    if i - 1 in adjacent:
+                        firsts.setdefault(i, None)
+                else:
+                    if isinstance(item, Exception):
+                        raise item
+                    if i - 1 in adjacent and i not in firsts:
+                        firsts[i] = item
+                    if i in adjacent:
+                        item, held[i] = held.get(i), item
+                    if item is not None:
+                        yield i, item
+                for j in (i - 1, i):
+                    if j in lasts and j + 1 in firsts and (
+                        (last := lasts.pop(j)) is not None
+                        and last != firsts[j + 1]
+                    ):
+                        yield j, last
+        finally:
+            stopped = True
+            for future in futures:
+                future.cancel()
+            # unblock the workers that are waiting for a free slot
+            while not all(f.done() for f in futures):
+                try:
+                    get(timeout=.05)
+                except Empty:
+                    pass
+            executor.shutdown()
+
+    def list_records(
+        self, list: str, params: dict, fields: Iterable[str], **kwargs
+    ) -> Generator[tuple, None, None]:
+        """Post a list query and yield compact records of the given fields.
+
+        Records are instances of a `namedtuple` type, see `record_type`.
+        Missing fields are None.
+        `kwargs` are passed to `self.post_and_continue`.
+        """
+        make = record_type(fields := (*fields,))._make
+        for json in self._list_json(list, params, **kwargs):
+            for item in json['query'][list]:
+                get = item.get
+                yield make([get(f) for f in fields])
+
+    def list_columns(
+        self, list: str, params: dict, fields: Iterable[str], **kwargs
+    ) -> Generator[dict, None, None]:
+        """Post a list query and yield a column-oriented batch per response.
+
+        Each batch is a dict from field name to the values of that field.
+        A column whose values are all integers is an `array('q')`, other
+        columns are lists with None for missing values.
+        `kwargs` are passed to `self.post_and_continue`.
+        """
+        fields = (*fields,)
+        for json in self._list_json(list, params, **kwargs):
+            items = json['query'][list]
+            columns = {}
+            for field in fields:
+                values = [item.get(field) for item in items]
+                columns[field] = array('q', values) if all(
+                    type(v) is int for v in values) else values
+            yield columns
+
+    def _list_json(
+        self, list: str, params: dict, **kwargs
+    ) -> Generator[dict, None, None]:
         params['list'] = list
-        for json in self.query(params):
+        for json in self.query(params, **kwargs):
             assert json['batchcomplete'] is True  # T84977#5471790
-            for item in json['query'][list]:
-                yield item
+            yield json
+
+    def query_modules(
+        self, params: dict, lists: Iterable[str] = (),
+        metas: Iterable[str] = (), **kwargs
+    ) -> dict[str, Iterator]:
+        """Query several list and meta modules using shared requests.
+
+        Return a dict from each module name to an iterator of its results.
+        List iterators yield the list items. Meta iterators yield the result
+        of the module once for each response that contains it, e.g.
+        `siteinfo` yields a dict of the requested `siprop` keys.
+
+        The iterators are fed lazily from the same continued query. Results
+        of the other modules are buffered until their iterator is consumed.
+        Finished modules, as reported in the `continue` value, are removed
+        from the subsequent continuation requests.
+        `kwargs` are passed to `self.post_and_continue`.
+
+        https://www.mediawiki.org/wiki/API:Query#Continuing_queries
+        """
+        lists, metas = (*lists,), (*metas,)
+        if lists:
+            params['list'] = lists
+        if metas:
+            params['meta'] = metas
+        active = {*lists, *metas}
+        buffers = {name: deque() for name in active}
+        meta_keys = {
+            m: ('repos' if m == 'filerepoinfo' else m) for m in metas}
+        claimed_keys = {*lists, *meta_keys.values()}
+        responses = self.query(params, **kwargs)
+
+        def pull() -> bool:
+            if (json := next(responses, None)) is None:
+                return False
+            if (query := json.get('query')) is not None:
+                for name in lists:
+                    if (items := query.get(name)) is not None:
+                        buffers[name] += items
+                for name, key in meta_keys.items():
+                    if name == 'siteinfo':
+                        if result := {
+                            k: v for k, v in query.items()
+                            if k not in claimed_keys
+                        }:
+                            buffers[name].append(result)
+                    elif (result := query.get(key)) is not None:
+                        buffers[name].append(result)
+            if (continue_ := json.get('continue')) is None:
+                active.clear()
+                return True
+            active.difference_update(
+                continue_['continue'].partition('||')[2].split('|'))
+            for param, modules in (('list', lists), ('meta', metas)):
+                if modules := (*(m for m in modules if m in active),):
+                    params[param] = modules
+                else:
+                    params.pop(param, None)
+            return True
+
+        def results(name: str) -> Iterator:
+            buffer = buffers[name]
+            popleft = buffer.popleft
+            while True:
+                while buffer:
+                    yield popleft()
+                if name not in active or not pull():
+                    return
+
+        return {name: results(name) for name in (*lists, *metas)}
 
     def meta(self, meta, params: dict) -> dict:
         """Post a meta query and return the result .
@@ -510,14 +1031,24 @@ class API:
             assert 'continue' not in json
             return json['query'][meta]
 
-    def prop(self, prop: str, params: dict) -> Generator[dict, None, None]:
+    def prop(
+        self, prop: str, params: dict, *, checkpoint: Checkpoint = None,
+        **kwargs
+    ) -> Generator[dict, None, None]:
         """Post a prop query, handle batchcomplete, and yield the results.
 
+        `checkpoint` is only updated on batch boundaries, so that a resumed
+        query does not yield partial pages.
+        `kwargs` are passed to `self.post_and_continue`.
+
         https://www.mediawiki.org/wiki/API:Properties
         """
         params['prop'] = prop
+        if checkpoint is not None:
+            kwargs['checkpoint'] = query_checkpoint = Checkpoint(
+                checkpoint.offset, checkpoint.continue_)
         batch = None
-        for json in self.query(params):
+        for json in self.query(params, **kwargs):
             if (query := json.get('query')) is None:
                 continue
             pages = query['pages']
@@ -525,6 +1056,8 @@ class API:
                 if batch is None:
                     for page in pages:
                         yield page
+                    if checkpoint is not None:
+                        checkpoint.update(*query_checkpoint.pending)
                     continue
                 for page, batch_page in zip(pages, batch):
                     if (pp := page.get(prop)) is not None:
@@ -536,6 +1069,8 @@ class API:
                     else:
                         yield batch_page
                 batch = None
+                if checkpoint is not None:
+                    checkpoint.update(*query_checkpoint.pending)
                 continue
             if batch is None:
                 batch = pages
@@ -544,6 +1079,44 @@ class API:
                 if (pp := page.get(prop)) is not None:
                     if (bp := batch_page.setdefault(prop, pp)) is not pp:
                         bp += pp
+        if checkpoint is not None:
+            checkpoint.save()
+
+    def revisions(
+        self, revids: Iterable[Union[int, str]], *,
+        store: RevisionStore = None, role: str = 'main', **kwargs
+    ) -> Generator[tuple[int, Optional[str]], None, None]:
+        """Yield (revid, content) for the given revision IDs.
+
+        Contents that are found in `store` are yielded without any request.
+        The missing ones are fetched in batches of `self.limit` revids using
+        `self.prop` and are written into `store`. The content of a deleted
+        or hidden revision is None. Invalid revids are not yielded.
+        `kwargs` are passed to `self.post_and_continue`.
+        """
+        missing = []
+        append = missing.append
+        for revid in revids:
+            if store is not None and \
+                    (content := store.get(int(revid), role)) is not None:
+                yield int(revid), content
+                continue
+            append(f'{revid}')
+            if len(missing) >= self.limit:
+                yield from self._fetch_revisions(missing, store, role, kwargs)
+                missing.clear()
+        if missing:
+            yield from self._fetch_revisions(missing, store, role, kwargs)
+
+    def _fetch_revisions(
+        self, revids: list, store: Optional[RevisionStore], role: str,
+        kwargs: dict
+    ) -> Generator[tuple[int, Optional[str]], None, None]:
+        for page in self.prop('revisions', {
+            'revids': revids, 'rvprop': 'ids|content', 'rvslots': role,
+        }, revision_store=store, **kwargs):
+            for revision in page.get('revisions', ()):
+                yield revision['revid'], revision['slots'][role].get('content')
 
     def upload(self, data: dict, files=None) -> dict:
         """Post an action=upload request and return the 'upload' key of resp
@@ -615,6 +1188,71 @@ class API:
         return self._user
 
 
+def _unique(iterable: Iterable) -> Iterator:
+    seen = set()
+    add = seen.add
+    for item in iterable:
+        if item not in seen:
+            add(item)
+            yield item
+
+
+@lru_cache
+def record_type(fields: tuple[str, ...]) -> type:
+    """Return a cached namedtuple type with the given fields.
+
+    Invalid identifiers are renamed to positional names, e.g. `_0`.
+    """
+    return namedtuple(
+        'Record', fields, defaults=(None,) * len(fields), rename=True)
+
+
+def _adjacent(shard: dict, next_shard: dict) -> bool:
+    """Return True if a `{prefix}to` of `shard` starts `next_shard`."""
+    return any(
+        k.endswith('to') and next_shard.get(f'{k[:-2]}from') == v
+        for k, v in shard.items())
+
+
+def key_ranges(prefix: str, boundaries: Iterable[str]) -> list[dict]:
+    """Return `{prefix}from`/`{prefix}to` shards for `API.sharded_list`.
+
+    For example `key_ranges('ap', ('H', 'P'))` returns
+    `[{'apto': 'H'}, {'apfrom': 'H', 'apto': 'P'}, {'apfrom': 'P'}]`.
+
+    Note that MediaWiki treats both ends of such ranges as inclusive, i.e.
+    an item that exactly matches one of the boundaries is returned by both of
+    the adjacent shards. `API.sharded_list` yields such items only once.
+    """
+    from_, to = f'{prefix}from', f'{prefix}to'
+    shards = [{}]
+    for boundary in boundaries:
+        shards[-1][to] = boundary
+        shards.append({from_: boundary})
+    return shards
+
+
+def time_windows(
+    prefix: str, start: datetime, end: datetime, n: int
+) -> list[dict]:
+    """Split [start, end] into `n` shards for `API.sharded_list`.
+
+    Return dicts of `{prefix}start`, `{prefix}end`, and `{prefix}dir=newer`
+    parameters, e.g. `time_windows('rc', start, end, 4)` for recentchanges
+    or `time_windows('le', start, end, 4)` for logevents. The windows are
+    disjoint at MediaWiki's timestamp resolution (one second).
+    """
+    step = (end - start) / n
+    bounds = [start + step * i for i in range(n)]
+    ends = [b - timedelta(seconds=1) for b in bounds[1:]] + [end]
+    dir_, start_, end_ = f'{prefix}dir', f'{prefix}start', f'{prefix}end'
+    return [{
+        dir_: 'newer',
+        start_: b.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        end_: e.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    } for b, e in zip(bounds, ends)]
+
+
 def load_config() -> None:
     global CONFIG
     if CONFIG is None:
@@ -0,0 +1,156 @@
+from logging import warning
+from threading import Lock
+from time import monotonic
+from typing import Callable, Literal
+
+from requests import Response
+
+from ._api import API, PYMWError
+
+
+class CircuitOpenError(PYMWError):
+    """Raised instead of sending a request to a URL whose circuit is open."""
+    __slots__ = ()
+
+
+class CircuitBreaker:
+    """Track the health of an API URL and fail fast while it is down.
+
+    The circuit is `closed` while requests succeed. After
+    `failure_threshold` consecutive failures, i.e. exceptions raised by the
+    transport or 5xx responses, it is `open` and requests fail with
+    `CircuitOpenError` without being sent.
+    After `reset_timeout` seconds it is `half-open`: a single probe request
+    is let through, which closes the circuit on success and opens it again
+    on failure.
+
+    Breakers are shared per URL, use `for_url` to get one and `health` to
+    see the state of all of them, e.g. to route work to the healthy wikis.
+    """
+    __slots__ = 'url', 'failure_threshold', 'reset_timeout', 'failures', \
+        '_opened_at', '_probing', '_lock'
+
+    _registry: dict[str, 'CircuitBreaker'] = {}
+    _registry_lock = Lock()
+
+    def __init__(
+        self, url: str, failure_threshold: int = 5,
+        reset_timeout: float = 30.,
+    ) -> None:
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.url!r})'
+
+    @classmethod
+    def for_url(cls, url: str, **kwargs) -> 'CircuitBreaker':
+        """Return the breaker of `url`, create it using `kwargs` if needed.
+        """
+        with cls._registry_lock:
+            if (breaker := cls._registry.get(url)) is None:
+                breaker = cls._registry[url] = cls(url, **kwargs)
+            return breaker
+
+    @classmethod
+    def health(cls) -> dict[str, str]:
+        """Return the state of the breaker of each URL."""
+        with cls._registry_lock:
+            breakers = [*cls._registry.values()]
+        return {breaker.url: breaker.state for breaker in breakers}
+
+    @property
+    def state(self) -> Literal['closed', 'open', 'half-open']:
+        if (opened_at := self._opened_at) is None:
+            return 'closed'
+        if monotonic() - opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def before_request(self) -> None:
+        """Raise `CircuitOpenError` if a request may not be sent now."""
+        with self._lock:
+            if (opened_at := self._opened_at) is None:
+                return
+            if (wait := opened_at + self.reset_timeout - monotonic()) > 0:
+                raise CircuitOpenError(
+                    f'circuit of {self.url} is open for {wait:.1f} more '
+                    f'seconds')
+            if self._probing:
+                raise CircuitOpenError(
+                    f'circuit of {self.url} is half-open and being probed')
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """Allow a new probe after an inconclusive one."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or (
+                self._opened_at is None
+                and self.failures >= self.failure_threshold
+            ):
+                if self._opened_at is None:
+                    warning(f'opening the circuit of {self.url} after '
+                            f'{self.failures} consecutive failures')
+                self._opened_at = monotonic()
+                self._probing = False
+
+
+class CircuitBreakerTransport:
+    """A transport that guards another one with a `CircuitBreaker`.
+
+    Use `add_circuit_breaker` to install one on an `API` instance.
+    """
+    __slots__ = 'transport', 'breaker'
+
+    def __init__(
+        self, transport: Callable[..., Response], breaker: CircuitBreaker
+    ) -> None:
+        self.transport = transport
+        self.breaker = breaker
+
+    def __call__(
+        self, *, data: dict, params: dict = None, files: dict = None
+    ) -> Response:
+        (breaker := self.breaker).before_request()
+        try:
+            resp = self.transport(data=data, params=params, files=files)
+        except CircuitOpenError:  # of a nested breaker, nothing was sent
+            breaker.release_probe()
+            raise
+        except Exception:  # of any transport, not only RequestException
+            breaker.record_failure()
+            raise
+        except BaseException:  # e.g. KeyboardInterrupt, not a server failure
+            breaker.release_probe()
+            raise
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return resp
+
+
+def add_circuit_breaker(api: API, **kwargs) -> CircuitBreaker:
+    """Guard the transport of `api` with the shared breaker of its URL.
+
+    `kwargs` are passed to `CircuitBreaker` if it does not exist yet.
+    """
+    breaker = CircuitBreaker.for_url(api.url, **kwargs)
+    api.transport = CircuitBreakerTransport(api.transport, breaker)
+    return breaker
@@ -0,0 +1,142 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from hashlib import sha1 as new_sha1
+from itertools import islice
+from logging import warning
+from pathlib import Path
+from threading import BoundedSemaphore, Lock
+from time import sleep
+from typing import Iterable, Iterator, Union
+from urllib.parse import urlsplit
+
+from requests import RequestException
+
+from ._api import API, PYMWError
+
+
+def _download_part(
+    api: API, url: str, part: Path, size: int, buffer_size: int
+) -> str:
+    """Download the rest of `part` and return the SHA-1 of the whole file."""
+    digest = new_sha1()
+    update = digest.update
+    offset = 0
+    if part.exists():
+        with part.open('rb') as f:
+            while data := f.read(buffer_size):
+                update(data)
+                offset += len(data)
+        if size is not None and offset >= size:
+            if offset == size:
+                return digest.hexdigest()
+            digest, offset = new_sha1(), 0  # discard the invalid part
+            update = digest.update
+    # the offsets of a Range request are of the unencoded file
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+    with api.session.get(url, headers=headers, stream=True) as resp:
+        resp.raise_for_status()
+        if resp.status_code != 206:  # the server has ignored the Range
+            digest = new_sha1()
+            update = digest.update
+        with part.open('ab' if resp.status_code == 206 else 'wb') as f:
+            write = f.write
+            for data in resp.iter_content(buffer_size):
+                update(data)
+                write(data)
+    return digest.hexdigest()
+
+
+def download(
+    api: API, url: str, path: Union[str, Path], *, size: int = None,
+    sha1: str = None, buffer_size: int = 1 << 16, retries: int = 3,
+) -> Path:
+    """Stream `url` into `path` using the session of `api`.
+
+    The body is written in `buffer_size` chunks into `{path}.part`, which is
+    renamed to `path` when the download is complete and verified. An
+    existing part file, e.g. of an interrupted download, is resumed using an
+    HTTP Range request. Transport errors are retried the same way.
+
+    :param size: The expected size, e.g. `size` of `iiprop=size`.
+    :param sha1: The expected SHA-1 hexdigest, e.g. `sha1` of `iiprop=sha1`.
+        It is computed while the file is being written.
+    :raise PYMWError: If the size or SHA-1 of the file is not the expected
+        one. The part file is deleted in this case.
+    """
+    path = Path(path)
+    part = path.with_name(f'{path.name}.part')
+    for attempt in range(retries + 1):
+        try:
+            digest = _download_part(api, url, part, size, buffer_size)
+            break
+        except RequestException as e:
+            if attempt == retries:
+                raise
+            warning(f'{e!r} (retrying after {2 ** attempt} seconds)')
+            sleep(2 ** attempt)
+    if size is not None and (actual := part.stat().st_size) != size:
+        part.unlink()
+        raise PYMWError(f'{url} has {actual} bytes instead of {size}')
+    if sha1 is not None and digest != sha1:
+        part.unlink()
+        raise PYMWError(f'SHA-1 mismatch for {url}: {digest} != {sha1}')
+    part.replace(path)
+    return path
+
+
+def download_files(
+    api: API, pages: Iterable[dict], directory: Union[str, Path], *,
+    workers: int = 8, max_per_host: int = 4, **kwargs
+) -> Iterator[tuple[dict, Union[Path, Exception]]]:
+    """Download the files of `pages` concurrently into `directory`.
+
+    `pages` are the results of an imageinfo query, e.g.
+    `api.prop('imageinfo', {'iiprop': 'url|size|sha1', ...})`. The size and
+    SHA-1 of each file are verified if they have been requested.
+
+    Yield `(page, result)` tuples in the order of completion, where `result`
+    is the path of the downloaded file or the raised exception. Files are
+    named after the page titles with spaces replaced by underscores. At most
+    `max_per_host` downloads run concurrently for each host.
+
+    `kwargs` are passed to `download`.
+
+    https://www.mediawiki.org/wiki/API:Imageinfo
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    semaphores = {}
+    semaphores_lock = Lock()
+
+    def download_page(page: dict) -> Path:
+        if not (imageinfo := page.get('imageinfo')):
+            raise PYMWError(f"{page['title']} has no imageinfo")
+        info = imageinfo[0]
+        url = info['url']
+        with semaphores_lock:
+            if (semaphore := semaphores.get(
+                    host := urlsplit(url).netloc)) is None:
+                semaphore = semaphores[host] = BoundedSemaphore(max_per_host)
+        with semaphore:
+            return download(
+                api, url, directory / page['title'].partition(':')[2]
+                .replace(' ', '_'), size=info.get('size'),
+                sha1=info.get('sha1'), **kwargs)
+
+    pages = iter(pages)
+    with ThreadPoolExecutor(workers) as executor:
+        submit = executor.submit
+        pending = {submit(download_page, page): page for page in islice(
+            pages, 2 * workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield page, result
+                for page in islice(pages, 1):
+                    pending[submit(download_page, page)] = page
@@ -0,0 +1,193 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, \
+    wait
+from itertools import islice
+from logging import warning
+from threading import Lock
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+from ._api import API, APIError
+
+
+# stashing is I/O-bound and best-effort, a small shared pool is enough
+_stash_executor = ThreadPoolExecutor(4, thread_name_prefix='stashedit')
+
+
+class TokenBucket:
+    """A thread-safe token bucket for pacing requests.
+
+    :param rate: Number of tokens that are added per second.
+    :param capacity: Maximum number of tokens, i.e. the allowed burst size.
+    """
+    __slots__ = 'rate', 'capacity', '_tokens', '_updated', '_lock'
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = self._tokens = capacity
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.rate!r}, {self.capacity!r})'
+
+    @classmethod
+    def from_ratelimits(
+        cls, ratelimits: dict, action: str = 'edit'
+    ) -> Optional['TokenBucket']:
+        """Create a bucket for the most restrictive limit of `action`.
+
+        :param ratelimits: The `ratelimits` of
+            `API.meta('userinfo', {'uiprop': 'ratelimits'})`.
+        :return: None if there is no limit for `action`.
+        """
+        if not (limits := ratelimits.get(action)):
+            return None
+        hits, seconds = min(
+            ((limit['hits'], limit['seconds']) for limit in limits.values()),
+            key=lambda hits_seconds: hits_seconds[0] / hits_seconds[1])
+        return cls(hits / seconds, hits)
+
+    def acquire(self) -> None:
+        """Take a token, sleep until it is available if needed."""
+        with self._lock:
+            now = monotonic()
+            tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate) - 1
+            self._tokens, self._updated = tokens, now
+        if tokens < 0:  # reserved a future token
+            sleep(-tokens / self.rate)
+
+
+def bulk_edit(
+    api: API, edits: Iterable[dict], *, workers: int = 4,
+    bucket: TokenBucket = None, retries: int = 3,
+    on_conflict: Callable[[dict], Optional[dict]] = None,
+) -> Iterator[tuple[dict, Union[dict, Exception]]]:
+    """Post `action=edit` requests concurrently and yield their results.
+
+    Yield `(edit, result)` tuples in the order of completion, where `result`
+    is the `edit` dict of the response or the raised exception. At most
+    `2 * workers` edits are taken from `edits` ahead of their completion.
+
+    The csrf token is fetched once and shared by the workers. `badtoken`
+    errors are retried with a new token, `ratelimited` errors after an
+    exponential backoff, and `editconflict` errors with the edit that
+    `on_conflict` returns for the failed one, if any.
+
+    :param edits: Parameters of each edit, e.g. `{'title': 'T', 'text': ''}`.
+    :param bucket: Pace the requests using this bucket. By default it is
+        created from the `ratelimits` of the current user.
+    :param retries: Maximum number of retries for each edit.
+    :param on_conflict: A function that receives the conflicted edit and
+        returns a rebased one, or None to give up.
+
+    https://www.mediawiki.org/wiki/API:Edit
+    """
+    if bucket is None:
+        bucket = TokenBucket.from_ratelimits(api.meta(
+            'userinfo', {'uiprop': 'ratelimits'})['ratelimits'])
+    api.tokens['csrf']  # fetch the shared token before starting the workers
+
+    def edit(data: dict) -> dict:
+        for attempt in range(retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                return api.post({'action': 'edit'} | data)['edit']
+            except APIError as e:
+                if attempt == retries:
+                    raise
+                if (code := e.code) == 'badtoken':
+                    continue  # the token has been invalidated by api
+                if code == 'ratelimited':
+                    sleep(2 ** attempt)
+                    continue
+                if code == 'editconflict' and on_conflict is not None and \
+                        (data := on_conflict(data)) is not None:
+                    continue
+                raise
+
+    edits = iter(edits)
+    with ThreadPoolExecutor(workers) as executor:
+        submit = executor.submit
+        pending = {submit(edit, data): data for data in islice(
+            edits, 2 * workers)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                data = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield data, result
+                for data in islice(edits, 1):
+                    pending[submit(edit, data)] = data
+
+
+class StashedEdit:
+    """An edit whose content is being pre-parsed by `action=stashedit`.
+
+    Create instances using `stash_edit`.
+    """
+    __slots__ = 'api', 'params', '_future'
+
+    def __init__(self, api: API, params: dict, future: Future) -> None:
+        self.api = api
+        self.params = params
+        self._future = future
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.params['title']!r})"
+
+    def result(self) -> Optional[dict]:
+        """Wait for and return the `stashedit` dict of the stash response.
+
+        Return None if stashing has failed. Stashing is only an optimization
+        and its failure should not prevent the edit.
+        """
+        try:
+            return self._future.result()['stashedit']
+        except Exception as e:
+            warning(f'stashedit failed: {e!r}')
+            return None
+
+    def save(self, **params) -> dict:
+        """Post the stashed edit and return the `edit` dict of the response.
+
+        `params` are added to the edit parameters, e.g. `summary`, `minor`.
+        If the stash is still being processed it is waited for, so that the
+        server can reuse its parser output.
+        """
+        self.result()
+        return self.api.post({'action': 'edit'} | self.params | params)[
+            'edit']
+
+
+def stash_edit(
+    api: API, title: str, text: str, *, baserevid: int,
+    contentmodel: str = 'wikitext', contentformat: str = 'text/x-wiki',
+    **params,
+) -> StashedEdit:
+    """Start stashing an edit in the background and return a `StashedEdit`.
+
+    The server parses and caches the stashed content while the caller is
+    doing something else, e.g. reviewing the diff or preparing the next
+    page. `StashedEdit.save` then posts the same content with `action=edit`;
+    the server finds the stash by the hash of the content and skips parsing
+    it again.
+
+    :param baserevid: ID of the revision that the edit is based on, 0 for
+        new pages.
+    :param params: Common parameters of `stashedit` and `edit`, e.g.
+        `section` or `summary`.
+
+    https://www.mediawiki.org/wiki/API:Stashedit
+    """
+    params |= {
+        'title': title, 'text': text, 'baserevid': baserevid,
+        'contentmodel': contentmodel, 'contentformat': contentformat}
+    future = _stash_executor.submit(
+        api.post, {'action': 'stashedit'} | params)
+    return StashedEdit(api, params, future)
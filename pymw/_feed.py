@@ -0,0 +1,96 @@
+from time import monotonic, sleep
+from typing import Iterator, Optional
+
+from ._api import API
+
+
+class RecentChangesFeed:
+    """Iterate over new recent changes by adaptively polling the API.
+
+    Each poll lists the changes since the last seen timestamp using
+    `rclimit=max` and continuations, so that a burst of changes is caught up
+    in as few requests as possible. Changes that are returned again, because
+    of the inclusive `rcstart`, are dropped by their `rcid`. The interval
+    between polls is adapted to keep about `target` changes per poll.
+
+    :param params: Extra recentchanges parameters, e.g. `{'rctype': 'edit'}`.
+        `ids` and `timestamp` are always added to `rcprop`.
+    :param rcstart: The timestamp to start from. By default only the changes
+        after the current latest change are yielded.
+    :param target: The desired number of changes per poll.
+    :param min_interval: Minimum number of seconds between polls.
+    :param max_interval: Maximum number of seconds between polls.
+
+    https://www.mediawiki.org/wiki/API:RecentChanges
+    """
+    __slots__ = 'api', 'params', 'timestamp', 'rcids', 'target', \
+        'min_interval', 'max_interval', 'interval', 'rate', '_polled_at'
+
+    def __init__(
+        self, api: API, params: dict = None, rcstart: str = None, *,
+        target: int = 50, min_interval: float = 1.,
+        max_interval: float = 60.,
+    ) -> None:
+        self.api = api
+        params = {} if params is None else params.copy()
+        params['rcprop'] = '|'.join(sorted(
+            {'ids', 'timestamp', *params.get('rcprop', 'title').split('|')}))
+        self.params = params
+        self.timestamp = rcstart
+        # rcids of the changes at self.timestamp
+        self.rcids: set[int] = set()
+        self.target = target
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        # the observed number of changes per second
+        self.rate: Optional[float] = None
+        self._polled_at: Optional[float] = None
+
+    def __iter__(self) -> Iterator[dict]:
+        while True:
+            yield from self.poll()
+            sleep(self.interval)
+
+    def poll(self) -> list[dict]:
+        """Return the new changes since the last poll and adapt interval."""
+        if self.timestamp is None:
+            self._start_at_latest()
+            return []
+        params = self.params | {
+            'rcdir': 'newer', 'rcstart': self.timestamp, 'rclimit': 'max'}
+        changes = []
+        append = changes.append
+        # work on a copy, so that a failed poll does not mark its changes
+        # as seen
+        timestamp, rcids = self.timestamp, {*self.rcids}
+        for rc in self.api.list('recentchanges', params):
+            if (rcid := rc['rcid']) in rcids:
+                continue
+            if (ts := rc['timestamp']) != timestamp:
+                timestamp, rcids = ts, set()
+            rcids.add(rcid)
+            append(rc)
+        self.timestamp, self.rcids = timestamp, rcids
+        self._adapt(len(changes))
+        return changes
+
+    def _start_at_latest(self) -> None:
+        latest = next(self.api.list('recentchanges', self.params | {
+            'rcdir': 'older', 'rclimit': 1}), None)
+        if latest is not None:
+            self.timestamp = latest['timestamp']
+            self.rcids = {latest['rcid']}
+        self._polled_at = monotonic()
+
+    def _adapt(self, count: int) -> None:
+        now = monotonic()
+        if (polled_at := self._polled_at) is not None and now > polled_at:
+            rate = count / (now - polled_at)
+            self.rate = rate if self.rate is None else (self.rate + rate) / 2
+        self._polled_at = now
+        if self.rate:
+            interval = self.target / self.rate
+        else:
+            interval = self.interval * 2
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
@@ -0,0 +1,159 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from logging import warning
+from threading import Lock
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from ._api import API
+
+
+class Hooks:
+    """Callbacks for the events of an `API` instance.
+
+    Assign an instance to `API.hooks` to receive events. While `API.hooks`
+    is None, no event is created at all.
+
+    Callbacks are called with keyword arguments, always including `api`:
+
+    - `request_start`: `data` is about to be posted.
+    - `request_end`: `data` has been posted and `response` has been received
+      after `elapsed` seconds, or the transport raised `error` and
+      `response` is None.
+    - `api_error`: The response of `data` contained unhandled `errors`.
+    - `retry`: `data` is going to be posted again because of the error
+      `code`, e.g. after waiting `delay` seconds for `maxlag`.
+    - `token`: A `token_type` token was fetched in `elapsed` seconds.
+    - `login`: A login request for `lgname` resulted in `result`.
+    - `continuation`: A continued chain of `data` has ended after `depth`
+      requests.
+    """
+    __slots__ = '_callbacks',
+
+    def __init__(self) -> None:
+        self._callbacks: dict[str, list[Callable]] = {}
+
+    def add(self, event: str, callback: Callable) -> None:
+        self._callbacks.setdefault(event, []).append(callback)
+
+    def remove(self, event: str, callback: Callable) -> None:
+        self._callbacks[event].remove(callback)
+
+    def emit(self, event: str, /, **kwargs) -> None:
+        for callback in self._callbacks.get(event, ()):
+            callback(**kwargs)
+
+
+# parameters that should not be logged
+_SECRET_PARAMS = {'lgpassword', 'password', 'token', 'lgtoken'}
+
+
+def _shorten(value, width: int = 80) -> str:
+    return s if len(s := str(value)) <= width else s[:width - 3] + '...'
+
+
+def _request_size(response) -> int:
+    request = response.request
+    if (headers := getattr(request, 'headers', None)) is not None and \
+            (length := headers.get('Content-Length')) is not None:
+        return int(length)
+    if (body := getattr(request, 'body', None)) is None:
+        return 0
+    return len(body) if isinstance(body, bytes) else len(body.encode())
+
+
+class Metrics:
+    """A lightweight collector of request metrics.
+
+    Counts requests, request and response bytes, errors by code, retries,
+    maxlag waits, and continuation depths per action, and keeps a latency
+    histogram for each action with the upper bounds of `BUCKETS` seconds.
+
+    :param slow_threshold: Log a warning for every request that takes at
+        least this many seconds.
+    """
+    BUCKETS = (.05, .1, .25, .5, 1., 2.5, 5., 10., 30., float('inf'))
+    __slots__ = 'slow_threshold', 'requests', 'latencies', 'request_bytes', \
+        'response_bytes', 'errors', 'retries', 'maxlag_wait', \
+        'continuations', 'max_depth', '_lock'
+
+    def __init__(self, slow_threshold: float = None) -> None:
+        self.slow_threshold = slow_threshold
+        self.requests = Counter()
+        self.latencies: defaultdict[str, list[int]] = defaultdict(
+            lambda: [0] * len(self.BUCKETS))
+        self.request_bytes = Counter()
+        self.response_bytes = Counter()
+        self.errors = Counter()
+        self.retries = Counter()
+        self.maxlag_wait = 0.
+        self.continuations = Counter()
+        self.max_depth = Counter()
+        self._lock = Lock()
+
+    def attach(self, api: 'API') -> 'Metrics':
+        """Add the callbacks of this collector to `api.hooks`."""
+        if (hooks := api.hooks) is None:
+            hooks = api.hooks = Hooks()
+        hooks.add('request_end', self._request_end)
+        hooks.add('api_error', self._api_error)
+        hooks.add('retry', self._retry)
+        hooks.add('continuation', self._continuation)
+        return self
+
+    def detach(self, api: 'API') -> None:
+        hooks = api.hooks
+        hooks.remove('request_end', self._request_end)
+        hooks.remove('api_error', self._api_error)
+        hooks.remove('retry', self._retry)
+        hooks.remove('continuation', self._continuation)
+
+    def _request_end(self, *, api, data, response, elapsed, error) -> None:
+        action = data.get('action')
+        with self._lock:
+            self.requests[action] += 1
+            self.latencies[action][bisect_left(self.BUCKETS, elapsed)] += 1
+            if error is not None:
+                self.errors[type(error).__name__] += 1
+            else:
+                self.request_bytes[action] += _request_size(response)
+                self.response_bytes[action] += len(response.content)
+        if (threshold := self.slow_threshold) is not None \
+                and elapsed >= threshold:
+            warning(
+                f'slow request ({elapsed:.3f} seconds) to {api}: '
+                + ' '.join(
+                    f'{k}={_shorten(v)}' for k, v in data.items()
+                    if k not in _SECRET_PARAMS))
+
+    def _api_error(self, *, api, data, errors) -> None:
+        with self._lock:
+            self.errors.update(error['code'] for error in errors)
+
+    def _retry(self, *, api, data, code, delay=0) -> None:
+        with self._lock:
+            self.retries[code] += 1
+            self.maxlag_wait += delay
+
+    def _continuation(self, *, api, data, depth) -> None:
+        action = data.get('action')
+        with self._lock:
+            self.continuations[action] += depth - 1
+            if depth > self.max_depth[action]:
+                self.max_depth[action] = depth
+
+    def summary(self) -> dict:
+        """Return the collected metrics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'latency_buckets': [*self.BUCKETS[:-1], 'inf'],
+                'latencies': {k: [*v] for k, v in self.latencies.items()},
+                'request_bytes': dict(self.request_bytes),
+                'response_bytes': dict(self.response_bytes),
+                'errors': dict(self.errors),
+                'retries': dict(self.retries),
+                'maxlag_wait': self.maxlag_wait,
+                'continuations': dict(self.continuations),
+                'max_depth': dict(self.max_depth),
+            }
@@ -0,0 +1,142 @@
+from pathlib import Path
+from sqlite3 import Row, connect
+from typing import Optional, Union
+
+from ._api import API, PYMWError
+
+
+_UPSERT = 'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)'
+
+
+class PageMirror:
+    """A local SQLite index of page metadata kept fresh via recentchanges.
+
+    Call `load` to bulk-load the pages once and then `update` to apply the
+    changes that have happened since the last `load` or `update`.
+    Each page is stored as `pageid`, `ns`, `title`, `lastrevid`, `length`,
+    and `touched`.
+
+    https://www.mediawiki.org/wiki/API:RecentChanges
+    """
+    __slots__ = 'api', '_db'
+
+    def __init__(self, api: API, path: Union[str, Path] = ':memory:') -> None:
+        self.api = api
+        self._db = db = connect(path)
+        db.row_factory = Row
+        with db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS pages ('
+                'pageid INTEGER PRIMARY KEY, ns INTEGER, title TEXT UNIQUE, '
+                'lastrevid INTEGER, length INTEGER, touched TEXT)')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS state ('
+                'key TEXT PRIMARY KEY, value TEXT)')
+
+    def __enter__(self) -> 'PageMirror':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    @property
+    def rcstart(self) -> Optional[str]:
+        """The timestamp that the next `update` will start from."""
+        row = self._db.execute(
+            "SELECT value FROM state WHERE key = 'rcstart'").fetchone()
+        return None if row is None else row[0]
+
+    def get(self, title: str) -> Optional[dict]:
+        row = self._db.execute(
+            'SELECT * FROM pages WHERE title = ?', (title,)).fetchone()
+        return None if row is None else dict(row)
+
+    def get_by_id(self, pageid: int) -> Optional[dict]:
+        row = self._db.execute(
+            'SELECT * FROM pages WHERE pageid = ?', (pageid,)).fetchone()
+        return None if row is None else dict(row)
+
+    def load(self, params: dict = None) -> int:
+        """Bulk-load pages using `generator=allpages` and `prop=info`.
+
+        :param params: Extra query parameters, e.g. `{'gapnamespace': 4}`.
+        :return: The number of loaded pages.
+        """
+        # Remember the latest change before crawling to not miss anything.
+        latest = next(self.api.list(
+            'recentchanges', {'rcprop': 'timestamp', 'rclimit': 1}), None)
+        count = self._store_pages(self.api.prop('info', {
+            'generator': 'allpages', 'gaplimit': 'max'} | (params or {})))
+        if latest is not None:
+            self._set_rcstart(latest['timestamp'])
+        return count
+
+    def update(self, params: dict = None) -> int:
+        """Refresh the pages that have changed since the last load/update.
+
+        Edited and created pages are refreshed by their ID. Pages of log
+        events, e.g. deletions and moves, are refreshed by their titles.
+
+        :param params: Extra recentchanges parameters, e.g.
+            `{'rcnamespace': 0}`.
+        :return: The number of refreshed or removed pages.
+        """
+        if (rcstart := self.rcstart) is None:
+            raise PYMWError('`load` should be called before `update`')
+        pageids, titles = set(), set()
+        for rc in self.api.list('recentchanges', {
+            'rcdir': 'newer', 'rcstart': rcstart, 'rclimit': 'max',
+            'rcprop': 'ids|title|timestamp|loginfo',
+        } | (params or {})):
+            rcstart = rc['timestamp']
+            if rc['type'] == 'log':
+                titles.add(rc['title'])
+                if (target := rc.get('logparams', {}).get(
+                        'target_title')) is not None:
+                    titles.add(target)
+            elif rc['pageid']:
+                pageids.add(f"{rc['pageid']}")
+        count = 0
+        if pageids:
+            count += self._store_pages(
+                self.api.prop('info', {'pageids': [*pageids]}))
+        if titles:
+            count += self._store_pages(
+                self.api.prop('info', {'titles': [*titles]}))
+        # timestamps have a one-second resolution, the next update will
+        # process the changes of this second again, which is harmless
+        self._set_rcstart(rcstart)
+        return count
+
+    def _set_rcstart(self, timestamp: str) -> None:
+        with self._db as db:
+            db.execute(
+                "INSERT OR REPLACE INTO state VALUES ('rcstart', ?)",
+                (timestamp,))
+
+    def _store_pages(self, pages) -> int:
+        count = 0
+        with self._db as db:
+            execute = db.execute
+            for page in pages:
+                count += 1
+                if 'missing' in page or 'invalid' in page:
+                    if 'pageid' in page:
+                        execute(
+                            'DELETE FROM pages WHERE pageid = ?',
+                            (page['pageid'],))
+                    elif 'title' in page:
+                        execute(
+                            'DELETE FROM pages WHERE title = ?',
+                            (page['title'],))
+                    continue
+                execute(_UPSERT, (
+                    page['pageid'], page['ns'], page['title'],
+                    page['lastrevid'], page['length'], page['touched']))
+        return count
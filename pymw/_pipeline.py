@@ -0,0 +1,99 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from itertools import islice
+from os import cpu_count
+from queue import Queue
+from threading import Event, Semaphore, Thread
+from typing import Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def _apply(func: Callable[[T], R], batch: list[T]) -> list[R]:
+    return [func(item) for item in batch]
+
+
+class _End:
+    __slots__ = 'submitted', 'error'
+
+    def __init__(self, submitted: int, error: BaseException = None):
+        self.submitted = submitted
+        self.error = error
+
+
+def pipeline(
+    func: Callable[[T], R], items: Iterable[T], *, processes: int = None,
+    ordered: bool = True, batch_size: int = 1, max_pending: int = None,
+    executor: Executor = None,
+) -> Iterator[R]:
+    """Apply `func` to `items` in a process pool and yield the results.
+
+    `items` is consumed by a background thread, so a result stream of e.g.
+    `API.prop` or `API.post_and_continue` keeps fetching while the workers
+    process the items that have already arrived and while the caller
+    consumes the results. The items are sent to the workers in batches of
+    `batch_size` to reduce the inter-process overhead. Fetching pauses while
+    `max_pending` batches are waiting to be processed or consumed.
+
+    An exception raised by `func` is re-raised when its result would have
+    been yielded. An exception raised by `items` is re-raised after the
+    results of the preceding items.
+
+    :param func: A picklable function, e.g. one that is defined at the top
+        level of a module.
+    :param ordered: Yield the results in the order of `items`. Otherwise
+        yield the results of each batch as soon as it is completed.
+    :param max_pending: Defaults to twice the number of processes.
+    :param executor: Use this executor instead of a new
+        `ProcessPoolExecutor(processes)`. It is not shut down.
+    """
+    if own_executor := executor is None:
+        executor = ProcessPoolExecutor(processes)
+    if max_pending is None:
+        max_pending = 2 * (processes or cpu_count() or 1)
+    slots = Semaphore(max_pending)
+    queue: Queue = Queue()
+    put = queue.put
+    stop = Event()
+
+    def produce() -> None:
+        submitted = 0
+        try:
+            items_iter = iter(items)
+            while batch := [*islice(items_iter, batch_size)]:
+                while not slots.acquire(timeout=.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                future = executor.submit(_apply, func, batch)
+                submitted += 1
+                if ordered:
+                    put(future)
+                else:
+                    future.add_done_callback(put)
+        except BaseException as e:
+            put(_End(submitted, e))
+            return
+        put(_End(submitted))
+
+    Thread(target=produce, name='pipeline', daemon=True).start()
+    get = queue.get
+    yielded = 0
+    end = None
+    try:
+        while end is None or yielded < end.submitted:
+            if type(got := get()) is _End:
+                end = got
+                continue
+            future: Future = got
+            results = future.result()
+            yielded += 1
+            slots.release()
+            yield from results
+        if end.error is not None:
+            raise end.error
+    finally:
+        stop.set()
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,106 @@
+from csv import DictWriter
+from itertools import islice
+from json import JSONEncoder
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO, Union
+
+
+def _batches(items: Iterable, size: Optional[int]) -> Iterator[list]:
+    if size is None:  # items are already batched
+        for batch in items:
+            if batch:
+                yield batch
+        return
+    items = iter(items)
+    while batch := [*islice(items, size)]:
+        yield batch
+
+
+def write_ndjson(
+    items: Iterable[dict], file: TextIO, batch_size: Optional[int] = 500,
+    ensure_ascii: bool = False,
+) -> int:
+    """Write `items` to `file` as newline-delimited JSON.
+
+    `items` can be any stream of dicts, e.g. the result of `API.list`,
+    `API.prop`, or `API.post_and_continue`. Items are written in batches of
+    `batch_size` and the file is flushed after each batch. Return the number
+    of written items.
+
+    If `batch_size` is None, `items` should be a stream of lists of dicts
+    instead, each of which is written and flushed as one batch. This flushes
+    once per API response, e.g.
+
+        write_ndjson((json['query']['allpages'] for json in api.query({
+            'list': 'allpages', 'aplimit': 'max'})), file, batch_size=None)
+    """
+    encode = JSONEncoder(
+        ensure_ascii=ensure_ascii, separators=(',', ':')).encode
+    write, flush = file.write, file.flush
+    count = 0
+    for batch in _batches(items, batch_size):
+        write('\n'.join([encode(item) for item in batch]))
+        write('\n')
+        flush()
+        count += len(batch)
+    return count
+
+
+def write_csv(
+    items: Iterable[dict], file: TextIO, fields: Iterable[str],
+    batch_size: Optional[int] = 500, header: bool = True,
+) -> int:
+    """Write the given `fields` of `items` to `file` as CSV.
+
+    Other keys of the items are ignored and missing ones are left empty.
+    `file` should be opened with `newline=''`. See `write_ndjson` for the
+    other parameters.
+    """
+    writer = DictWriter(file, (*fields,), extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writerows, flush = writer.writerows, file.flush
+    count = 0
+    for batch in _batches(items, batch_size):
+        writerows(batch)
+        flush()
+        count += len(batch)
+    return count
+
+
+def write_parquet(
+    items: Iterable[dict], path: Union[str, Path],
+    batch_size: Optional[int] = 10_000, fields: Iterable[str] = None,
+    **kwargs,
+) -> int:
+    """Write `items` to a Parquet file. Requires `pyarrow`.
+
+    The columns are the given `fields` or, by default, all the keys of the
+    items in the first batch. The column types are inferred from the first
+    batch. Each batch is written as a row group. Keys that are not columns
+    are dropped and missing ones are null. `kwargs` are passed to
+    `pyarrow.parquet.ParquetWriter`. See `write_ndjson` for the other
+    parameters.
+    """
+    try:
+        from pyarrow import Table
+        from pyarrow.parquet import ParquetWriter
+    except ImportError:  # pragma: nocover
+        raise ImportError(
+            'write_parquet requires pyarrow: pip install pymw[parquet]')
+    from_pylist = Table.from_pylist
+    batches = _batches(items, batch_size)
+    if (batch := next(batches, None)) is None:
+        return 0
+    if fields is None:  # optional keys are missing from most items
+        fields = {k: None for item in batch for k in item}
+    table = Table.from_pydict({
+        field: [item.get(field) for item in batch] for field in fields})
+    count = len(batch)
+    with ParquetWriter(path, (schema := table.schema), **kwargs) as writer:
+        write_table = writer.write_table
+        write_table(table)
+        for batch in batches:
+            write_table(from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
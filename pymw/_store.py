@@ -0,0 +1,134 @@
+from hashlib import sha1
+from os import fdopen
+from pathlib import Path
+from sqlite3 import connect
+from tempfile import mkstemp
+from threading import Lock
+from typing import Iterator, Optional, Union
+from zlib import compress, decompress
+
+
+def revision_slots(json: dict) -> Iterator[tuple[dict, dict, str, dict]]:
+    """Yield (page, revision, role, slot) for the contents in a response.
+
+    For responses without `rvslots`, the revision itself is yielded as the
+    'main' slot.
+    """
+    if (query := json.get('query')) is None:
+        return
+    for page in query.get('pages', ()):
+        for revision in page.get('revisions', ()):
+            if (slots := revision.get('slots')) is None:
+                if 'content' in revision:
+                    yield page, revision, 'main', revision
+                continue
+            for role, slot in slots.items():
+                if 'content' in slot:
+                    yield page, revision, role, slot
+
+
+class ContentDir:
+    """Offload revision contents into a content-addressed directory.
+
+    Pass an instance as the `content_dir` argument of `API.post_and_continue`
+    or `API.prop` to have the `content` of each revision slot written into
+    `{path}/{sha1[:2]}/{sha1}` as UTF-8 and replaced with `contentsha1` and
+    `contentpath` keys before the response is yielded.
+    """
+    __slots__ = 'path',
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r})'
+
+    def offload(self, json: dict) -> None:
+        for _, _, _, slot in revision_slots(json):
+            slot['contentsha1'], slot['contentpath'] = self.write(
+                slot.pop('content'))
+
+    def write(self, content: str) -> tuple[str, str]:
+        """Store `content` and return its SHA-1 hexdigest and path."""
+        data = content.encode()
+        file = self.path / (digest := sha1(data).hexdigest())[:2] / digest
+        if not file.exists():
+            (parent := file.parent).mkdir(parents=True, exist_ok=True)
+            fd, tmp = mkstemp(dir=parent)
+            with fdopen(fd, 'wb') as f:
+                f.write(data)
+            Path(tmp).replace(file)
+        return digest, str(file)
+
+    def read(self, digest: str) -> str:
+        return (self.path / digest[:2] / digest).read_text('utf8')
+
+
+class RevisionStore:
+    """A revid-keyed local store of revision contents backed by SQLite.
+
+    Revision contents never change, therefore stored contents never expire.
+    Contents are compressed using zlib.
+
+    Pass an instance as the `revision_store` argument of
+    `API.post_and_continue` or `API.prop` to have the fetched contents
+    written into it, and as the `store` argument of `API.revisions` to only
+    fetch the missing ones. `hits` and `misses` count the results of `get`.
+    """
+    __slots__ = '_db', '_lock', 'hits', 'misses'
+
+    def __init__(self, path: Union[str, Path] = ':memory:') -> None:
+        self._db = db = connect(path, check_same_thread=False)
+        self._lock = Lock()
+        self.hits = self.misses = 0
+        with db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS revisions ('
+                'revid INTEGER, role TEXT, content BLOB, '
+                'PRIMARY KEY (revid, role)) WITHOUT ROWID')
+
+    def __enter__(self) -> 'RevisionStore':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                'SELECT COUNT(*) FROM revisions').fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / total if (total := self.hits + self.misses) else 0.
+
+    def get(self, revid: int, role: str = 'main') -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT content FROM revisions WHERE revid = ? AND role = ?',
+                (revid, role)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return decompress(row[0]).decode()
+
+    def put(self, revid: int, content: str, role: str = 'main') -> None:
+        with self._lock, self._db as db:
+            db.execute(
+                'INSERT OR IGNORE INTO revisions VALUES (?, ?, ?)',
+                (revid, role, compress(content.encode())))
+
+    def add(self, json: dict) -> None:
+        """Store the revision contents of an API response."""
+        if rows := [
+            (revision['revid'], role, compress(slot['content'].encode()))
+            for _, revision, role, slot in revision_slots(json)
+            if 'revid' in revision
+        ]:
+            with self._lock, self._db as db:
+                db.executemany(
+                    'INSERT OR IGNORE INTO revisions VALUES (?, ?, ?)', rows)
@@ -0,0 +1,59 @@
+from ._api import API
+
+
+class TitleNormalizer:
+    """Normalize page titles locally using the siteinfo of a wiki.
+
+    Underscores and runs of whitespace are replaced with single spaces,
+    a leading colon and any `#fragment` are removed, namespace names,
+    canonical names, and aliases are matched case-insensitively and replaced
+    with the local namespace name, and the first letter is uppercased in
+    namespaces that are `first-letter` case.
+
+    Interwiki prefixes and title validity are not checked.
+
+    Assign an instance to `API.title_normalizer` to have the `titles`
+    parameter normalized and deduplicated before it is split into chunks.
+
+    :param siteinfo: The result of `API.meta('siteinfo', ...)` with at least
+        `namespaces` and `namespacealiases` siprops.
+
+    https://www.mediawiki.org/wiki/API:Siteinfo
+    """
+    __slots__ = '_prefixes', '_first_letter'
+
+    def __init__(self, siteinfo: dict) -> None:
+        by_id = {}
+        prefixes = self._prefixes = {}
+        for ns in siteinfo['namespaces'].values():
+            by_id[ns['id']] = namespace = (
+                ns['name'], ns['case'] == 'first-letter')
+            for name in (ns['name'], ns.get('canonical')):
+                if name:
+                    prefixes[name.replace('_', ' ').lower()] = namespace
+        for alias in siteinfo.get('namespacealiases', ()):
+            prefixes[alias['alias'].replace('_', ' ').lower()] = \
+                by_id[alias['id']]
+        self._first_letter = by_id[0][1]
+
+    @classmethod
+    def from_api(cls, api: API) -> 'TitleNormalizer':
+        return cls(api.meta('siteinfo', {
+            'siprop': 'general|namespaces|namespacealiases'}))
+
+    def __call__(self, title: str) -> str:
+        title = ' '.join(title.partition('#')[0].replace('_', ' ').split())
+        if title[:1] == ':':
+            title = title[1:].lstrip()
+        prefix, colon, rest = title.partition(':')
+        if colon and (namespace := self._prefixes.get(
+                prefix.rstrip().lower())) is not None:
+            name, first_letter = namespace
+            if first_letter and (rest := rest.lstrip()):
+                rest = rest[0].upper() + rest[1:]
+            else:
+                rest = rest.lstrip()
+            return f'{name}:{rest}' if name else rest
+        if self._first_letter and title:
+            return title[0].upper() + title[1:]
+        return title
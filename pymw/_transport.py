@@ -0,0 +1,341 @@
+from asyncio import new_event_loop, run_coroutine_threadsafe
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, \
+    wait
+from gzip import open as gzip_open
+from json import dumps, loads
+from pathlib import Path
+from threading import Lock, Thread
+from time import perf_counter, sleep
+from typing import Callable, Iterable, Optional, Union
+from urllib.parse import urlencode
+
+from requests import ConnectionError, PreparedRequest, Response, Timeout
+from requests.structures import CaseInsensitiveDict
+
+from ._api import ACTION_PARAM_TOKEN, PYMWError, _FORM_HEADERS, \
+    _FormEncoder, __version__
+
+# parameters that change between runs or should not be written to disk
+_VOLATILE_PARAMS = {
+    'token', 'lgtoken', 'lgpassword', 'logintoken', 'createtoken',
+    'changeauthtoken', 'linktoken', 'password'}
+# response headers that are used by pymw
+_RECORDED_HEADERS = ('content-type', 'retry-after')
+
+
+def _request_key(data: dict) -> str:
+    return urlencode(sorted(
+        (k, f'{v}') for k, v in data.items()
+        if v is not None and k not in _VOLATILE_PARAMS))
+
+
+class Recorder:
+    """A transport that records the requests and responses of another one.
+
+    Each request/response pair is appended as one JSON line to a gzipped
+    file. Tokens and passwords are not recorded. Uploaded files are not
+    recorded either, only the other parameters of their requests.
+
+        with Recorder(api.transport, 'run.jsonl.gz') as api.transport:
+            ...
+    """
+    __slots__ = 'transport', '_file', '_lock'
+
+    def __init__(
+        self, transport: Callable[..., Response], path: Union[str, Path]
+    ) -> None:
+        self.transport = transport
+        self._file = gzip_open(path, 'at', encoding='utf8')
+        self._lock = Lock()
+
+    def __enter__(self) -> 'Recorder':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __call__(
+        self, *, data: dict, params: dict = None, files: dict = None
+    ) -> Response:
+        start = perf_counter()
+        resp = self.transport(data=data, params=params, files=files)
+        elapsed = perf_counter() - start
+        line = dumps({
+            'request': _request_key(data),
+            'status': resp.status_code,
+            'headers': {
+                k: v for k in _RECORDED_HEADERS
+                if (v := resp.headers.get(k)) is not None},
+            'content': resp.content.decode('utf8'),
+            'elapsed': round(elapsed, 6),
+        }, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+        return resp
+
+
+class Replayer:
+    """A transport that serves the responses recorded by a `Recorder`.
+
+    Responses are matched by the request parameters, ignoring tokens and
+    passwords, and repeated requests get their recorded responses in the
+    recorded order. Concurrent requests may therefore be replayed in a
+    different order than they were recorded.
+
+    :param latency: Sleep for the recorded duration of each request before
+        returning its response, instead of answering at full speed.
+    :raise PYMWError: On a request that has no recorded response left.
+    """
+    __slots__ = 'latency', '_responses', '_lock'
+
+    def __init__(self, path: Union[str, Path], latency: bool = False) -> None:
+        self.latency = latency
+        responses = self._responses = defaultdict(deque)
+        with gzip_open(path, 'rt', encoding='utf8') as f:
+            for line in f:
+                record = loads(line)
+                responses[record['request']].append(record)
+        self._lock = Lock()
+
+    def __len__(self):
+        """Return the number of the responses that are left."""
+        return sum(map(len, self._responses.values()))
+
+    def __call__(
+        self, *, data: dict, params: dict = None, files: dict = None
+    ) -> Response:
+        key = _request_key(data)
+        with self._lock:
+            if not (records := self._responses.get(key)):
+                raise PYMWError(f'no recorded response for {key}')
+            record = records.popleft()
+        if self.latency:
+            sleep(record['elapsed'])
+        resp = Response()
+        resp.status_code = record['status']
+        resp.headers = CaseInsensitiveDict(record['headers'])
+        resp._content = record['content'].encode('utf8')
+        resp.encoding = 'utf8'
+        resp.request = request = PreparedRequest()
+        request.method, request.body = 'POST', key
+        return resp
+
+
+class HTTPXTransport:
+    """A transport that multiplexes concurrent requests using HTTP/2.
+
+    Requires `httpx` with HTTP/2 support: `pip install pymw[http2]`.
+    Requests are sent by an `httpx.AsyncClient` that runs on a private event
+    loop thread. Requests that are sent concurrently, e.g. from the worker
+    threads of `API.sharded_list` or `bulk_edit`, therefore share a single
+    connection per host if the server supports HTTP/2, instead of one
+    connection per request. Otherwise HTTP/1.1 is used. Coroutines on the
+    same event loop can `await` the `post` method directly.
+
+    Cookies, including the login session, are kept by the client, not by
+    `API.session`.
+
+        api = API(url, transport=HTTPXTransport(url))
+
+    :param headers: Default headers. The default `User-Agent` is the same as
+        the one of `API`.
+    :param http2: Negotiate HTTP/2 using TLS ALPN.
+    :param kwargs: Passed to `httpx.AsyncClient`, e.g. `timeout` or
+        `limits`.
+    """
+    __slots__ = 'url', 'client', 'loop', '_thread', '_encode'
+
+    def __init__(
+        self, url: str, *, headers: dict = None, http2: bool = True,
+        **kwargs
+    ) -> None:
+        try:
+            from httpx import AsyncClient
+        except ImportError:  # pragma: nocover
+            raise ImportError(
+                'HTTPXTransport requires httpx: pip install pymw[http2]')
+        self.url = url
+        self.client = AsyncClient(
+            http2=http2,
+            headers={'User-Agent': f'mwpy/{__version__}'} | (headers or {}),
+            **kwargs)
+        self._encode = _FormEncoder()
+        # the sync http2 connection of httpcore is not safe to share between
+        # threads, the async one is safe as long as it stays on one loop
+        self.loop = loop = new_event_loop()
+        self._thread = Thread(
+            target=loop.run_forever, name='httpx', daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.url!r})'
+
+    def __enter__(self) -> 'HTTPXTransport':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        loop = self.loop
+        run_coroutine_threadsafe(self.client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+    async def post(
+        self, *, data: dict, params: dict = None, files: dict = None
+    ):
+        """Post the request on `self.loop` and return the response.
+
+        :raise requests.Timeout: On an `httpx.TimeoutException`.
+        :raise requests.ConnectionError: On other `httpx.TransportError`s.
+            These are the exceptions that the rest of pymw expects from a
+            transport, e.g. for retrying or for `CircuitBreaker`.
+        """
+        from httpx import TimeoutException, TransportError
+        try:
+            return await self._post(data, params, files)
+        except TimeoutException as e:
+            raise Timeout(e) from e
+        except TransportError as e:
+            raise ConnectionError(e) from e
+
+    async def _post(self, data: dict, params: dict, files: dict):
+        if files is None:
+            return await self.client.post(
+                self.url, params=params, content=self._encode(data),
+                headers=_FORM_HEADERS)
+        return await self.client.post(  # multipart/form-data
+            self.url, params=params,
+            data={k: v for k, v in data.items() if v is not None},
+            files={
+                k: (name, bytes(content) if isinstance(content, memoryview)
+                    else content)
+                for k, (name, content) in files.items()})
+
+    def __call__(self, *, data: dict, params: dict = None, files: dict = None):
+        return run_coroutine_threadsafe(self.post(
+            data=data, params=params, files=files), self.loop).result()
+
+
+def _discard(future: Future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    # the body of an httpx.Response is already read and closed, calling its
+    # sync close would raise a RuntimeError if its stream is async
+    if not getattr(resp := future.result(), 'is_closed', False):
+        resp.close()
+
+
+class HedgedTransport:
+    """A transport that hedges slow read-only requests.
+
+    If the response of a request has not arrived after the `percentile` of
+    the recent latencies, a duplicate request is sent and the response that
+    arrives first is used. The other request is cancelled if it has not been
+    started yet, otherwise its response is closed as soon as it arrives.
+
+    Only requests of `actions` are hedged, never the ones that carry a token
+    according to `ACTION_PARAM_TOKEN` or upload files. Hedges are only sent
+    while they are at most `max_extra` of the hedgeable requests, and not
+    before `min_samples` latencies have been measured.
+
+        api.transport = HedgedTransport(api.transport)
+
+    :param window: Number of recent latencies that the delay is computed
+        from.
+    :param workers: Maximum number of concurrent requests.
+    """
+    __slots__ = 'transport', 'actions', 'percentile', 'max_extra', \
+        'min_samples', 'requests', 'hedges', 'wins', '_latencies', '_lock', \
+        '_executor'
+
+    def __init__(
+        self, transport: Callable[..., Response], *,
+        actions: Iterable[str] = ('query',), percentile: float = 95.,
+        max_extra: float = .05, window: int = 100, min_samples: int = 20,
+        workers: int = 8,
+    ) -> None:
+        self.transport = transport
+        self.actions = {
+            a for a in actions if ACTION_PARAM_TOKEN[a][0] is None}
+        self.percentile = percentile
+        self.max_extra = max_extra
+        self.min_samples = min_samples
+        self.requests = self.hedges = self.wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            workers, thread_name_prefix='hedge')
+
+    def __enter__(self) -> 'HedgedTransport':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+    @property
+    def delay(self) -> Optional[float]:
+        """The current hedging delay, None while there are too few samples.
+        """
+        with self._lock:
+            if len(latencies := sorted(self._latencies)) < self.min_samples:
+                return None
+        return latencies[min(
+            len(latencies) - 1, int(len(latencies) * self.percentile / 100))]
+
+    def _send(self, data: dict, params: Optional[dict]) -> Future:
+        start = perf_counter()
+        future = self._executor.submit(
+            self.transport, data=data, params=params, files=None)
+        future.add_done_callback(
+            lambda _: self._record(perf_counter() - start))
+        return future
+
+    def _record(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_extra * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def __call__(
+        self, *, data: dict, params: dict = None, files: dict = None
+    ) -> Response:
+        if files is not None or data.get('action') not in self.actions:
+            return self.transport(data=data, params=params, files=files)
+        with self._lock:
+            self.requests += 1
+        # post may modify data while the loser is still being sent
+        data = data.copy()
+        first = self._send(data, params)
+        if (delay := self.delay) is None or wait((first,), delay).done \
+                or not self._may_hedge():
+            return first.result()
+        second = self._send(data, params)
+        winner = None
+        pending = {first, second}
+        while winner is None and pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+        for future in (first, second):
+            if future is not winner and not future.cancel():
+                future.add_done_callback(_discard)
+        if winner is None:  # both have failed
+            return first.result()
+        if winner is second:
+            with self._lock:
+                self.wins += 1
+        return winner.result()
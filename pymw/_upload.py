@@ -0,0 +1,241 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, \
+    ThreadPoolExecutor, wait
+from hashlib import sha1
+from itertools import islice
+from logging import warning
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from time import monotonic, sleep
+from typing import Callable, Iterable, Iterator, Union
+
+from requests import RequestException
+
+from ._api import API, APIError
+
+
+def _is_retriable(e: Exception) -> bool:
+    if not isinstance(e, APIError):
+        return True  # RequestException
+    return (code := e.code) is not None and (
+        code == 'stashfailed' or code.startswith('internal_api_error'))
+
+
+def _retrying(call: Callable, retries: int, *args, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            return call(*args, **kwargs)
+        except (RequestException, APIError) as e:
+            if attempt == retries or not _is_retriable(e):
+                raise
+            warning(f'{e!r} (retrying after {2 ** attempt} seconds)')
+            sleep(2 ** attempt)
+
+
+def _wait_for_poll(
+    api: API, upload: dict, filekey: str, poll_interval: float, retries: int
+) -> dict:
+    while upload['result'] == 'Poll':
+        sleep(poll_interval)
+        upload = _retrying(
+            api.upload, retries, {'filekey': filekey, 'checkstatus': 1})
+    return upload
+
+
+def upload_path(
+    api: API, path: Union[str, Path], filename: str, *, state: dict = None,
+    chunk_size: int = 1 << 20, min_chunk_size: int = 1 << 16,
+    max_chunk_size: int = 1 << 26, chunk_seconds: float = 5.,
+    retries: int = 3, async_: bool = False, poll_interval: float = 5.,
+    ignorewarnings: bool = None, **params
+) -> dict:
+    """Upload a local file in memory-mapped chunks and return the result.
+
+    Chunks are zero-copy slices of the memory-mapped file. MediaWiki requires
+    the chunks of a file to be sent in order, therefore they are uploaded one
+    after another.
+    The chunk size is doubled or halved to keep the upload time of each
+    chunk close to `chunk_seconds`. Failed chunks are retried.
+
+    :param state: A dict that is updated with the `filekey` and `offset` of
+        the stashed upload after each chunk. Persist it and pass it again to
+        resume an interrupted upload.
+    :param chunk_size: Size of the first chunk in bytes.
+    :param retries: Maximum number of retries for each request. Transport
+        errors, `stashfailed`, and internal API errors are retried.
+    :param async_: Use `async=1` for assembling the chunks and for the final
+        commit, and poll for their completion.
+    :param params: Parameters of the final commit, e.g. `comment` and `text`.
+
+    https://www.mediawiki.org/wiki/API:Upload#Chunked_uploading
+    """
+    path = Path(path)
+    filesize = path.stat().st_size
+    if state is None:
+        state = {}
+    offset = state.get('offset', 0)
+    with path.open('rb') as f, mmap(f.fileno(), 0, access=ACCESS_READ) as m, \
+            memoryview(m) as view:
+        while offset < filesize:
+            data = {
+                'stash': 1, 'offset': offset, 'filename': filename,
+                'filesize': filesize, 'ignorewarnings': ignorewarnings}
+            if (filekey := state.get('filekey')) is not None:
+                data['filekey'] = filekey
+            if async_ and offset + chunk_size >= filesize:
+                data['async'] = 1
+            start = monotonic()
+            with view[offset:offset + chunk_size] as chunk:
+                upload = _retrying(
+                    api.upload, retries, data,
+                    files={'chunk': (filename, chunk)})
+            elapsed = monotonic() - start
+            state['filekey'] = filekey = upload['filekey']
+            upload = _wait_for_poll(
+                api, upload, filekey, poll_interval, retries)
+            state['offset'] = offset = upload['offset'] \
+                if upload['result'] == 'Continue' else filesize
+            if elapsed < chunk_seconds / 2:
+                chunk_size = min(chunk_size * 2, max_chunk_size)
+            elif elapsed > chunk_seconds * 2:
+                chunk_size = max(chunk_size // 2, min_chunk_size)
+    params |= {
+        'filename': filename, 'ignorewarnings': ignorewarnings,
+        'filekey': state['filekey']}
+    if async_:
+        params['async'] = 1
+    upload = _retrying(api.upload, retries, params)
+    return _wait_for_poll(
+        api, upload, state['filekey'], poll_interval, retries)
+
+
+def file_sha1(path: Union[str, Path], buffer_size: int = 1 << 20) -> str:
+    """Return the SHA-1 hexdigest of a file, as reported by `iiprop=sha1`."""
+    digest = sha1()
+    update = digest.update
+    with open(path, 'rb') as f:
+        while data := f.read(buffer_size):
+            update(data)
+    return digest.hexdigest()
+
+
+def _existing_sha1s(api: API, filenames: list[str]) -> dict[str, str]:
+    """Map each of `filenames` that exists on the wiki to its SHA-1."""
+    normalize = api.title_normalizer or str
+    titles = {normalize(f'File:{name}'): name for name in filenames}
+    sha1s = {}
+    for json in api.query({
+        'prop': 'imageinfo', 'iiprop': 'sha1', 'titles': [*titles]
+    }):
+        if (query := json.get('query')) is None:
+            continue
+        normalized = {n['to']: n['from'] for n in query.get('normalized', ())}
+        for page in query['pages']:
+            if imageinfo := page.get('imageinfo'):
+                title = page['title']
+                if (filename := titles.get(
+                        normalized.get(title, title))) is not None:
+                    sha1s[filename] = imageinfo[0]['sha1']
+    return sha1s
+
+
+def _hashed_reports(
+    api: API, uploads: Iterable[tuple[Union[str, Path], str]],
+    executor: ProcessPoolExecutor, batch_size: int,
+) -> Iterator[dict]:
+    uploads = iter(uploads)
+    while batch := [*islice(uploads, batch_size)]:
+        paths = [str(path) for path, _ in batch]
+        filenames = [filename for _, filename in batch]
+        digests = executor.map(file_sha1, paths)  # hash during the lookup
+        existing = _existing_sha1s(api, filenames)
+        for path, filename, digest in zip(paths, filenames, digests):
+            report = {'path': path, 'filename': filename, 'sha1': digest}
+            if (previous := existing.get(filename)) == digest:
+                report['status'] = 'unchanged'
+            elif previous is not None:
+                report['previous_sha1'] = previous
+            yield report
+
+
+def bulk_upload(
+    api: API, uploads: Iterable[tuple[Union[str, Path], str]], *,
+    workers: int = 4, processes: int = None, batch_size: int = 50,
+    skip_duplicates: bool = True, chunk_size: int = 1 << 20,
+    retries: int = 3, **params
+) -> Iterator[dict]:
+    """Upload the new or changed files of `uploads` and yield reports.
+
+    Local files are hashed in a pool of `processes` and their SHA-1 is
+    compared to the current version of their target file on the wiki, which
+    is looked up using `prop=imageinfo` for each batch of `batch_size`
+    filenames. Unchanged files are skipped without transferring them. If
+    `skip_duplicates` is true, files whose SHA-1 already exists under another
+    name, according to `list=allimages&aisha1=`, are skipped, too.
+
+    The remaining files are uploaded by `workers` threads; files larger than
+    `chunk_size` are uploaded in chunks using `upload_path`. Changed files
+    are uploaded with `ignorewarnings=1`, otherwise the `exists` warning
+    would prevent their new version from being saved.
+
+    Yield a report for each file in the order of completion, e.g.
+    `{'path': 'a.jpg', 'filename': 'A.jpg', 'sha1': '...', 'status':
+    'uploaded', 'result': {...}}`. `status` is one of `'unchanged'`,
+    `'duplicate'` (with a `duplicates` list of filenames), `'uploaded'`,
+    `'warning'` (the `result` contains the `warnings`), or `'failed'` (with
+    the raised exception as `error`). Reports of changed files also contain
+    the `previous_sha1` of their target.
+
+    :param uploads: (path, filename) pairs of the local files and their
+        target filenames.
+    :param params: Parameters of each upload, e.g. `comment` and `text`.
+
+    https://www.mediawiki.org/wiki/API:Upload
+    """
+    def upload(report: dict) -> dict:
+        if skip_duplicates and (duplicates := [
+            image['name'] for image in api.list('allimages', {
+                'aisha1': report['sha1'], 'ailimit': 'max'})
+        ]):
+            return {'status': 'duplicate', 'duplicates': duplicates}
+        path, filename = report['path'], report['filename']
+        if 'previous_sha1' in report:  # a new version of an existing file
+            kwargs = params | {'ignorewarnings': 1}
+        else:
+            kwargs = params
+        if Path(path).stat().st_size > chunk_size:
+            result = upload_path(
+                api, path, filename, chunk_size=chunk_size, retries=retries,
+                **kwargs)
+        else:
+            with open(path, 'rb') as f:
+                content = f.read()
+            result = _retrying(
+                api.upload_file, retries, file=content, filename=filename,
+                **kwargs)
+        return {
+            'status': 'uploaded' if result['result'] == 'Success'
+            else 'warning', 'result': result}
+
+    with ProcessPoolExecutor(processes) as hash_executor, \
+            ThreadPoolExecutor(workers) as executor:
+        reports = _hashed_reports(api, uploads, hash_executor, batch_size)
+        submit = executor.submit
+        pending = {}
+        while True:
+            for report in reports:
+                if 'status' in report:
+                    yield report
+                    continue
+                pending[submit(upload, report)] = report
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                report = pending.pop(future)
+                try:
+                    report |= future.result()
+                except Exception as e:
+                    report |= {'status': 'failed', 'error': e}
+                yield report
@@ -17,6 +17,7 @@ setup(
     packages=['pymw'],
     python_requires='>=3.9',
     install_requires=['requests'],
+    extras_require={'parquet': ['pyarrow'], 'http2': ['httpx[http2]']},
     tests_require=['pytest'],
     classifiers=[
         'Development Status :: 1 - Planning',
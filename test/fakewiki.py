@@ -0,0 +1,339 @@
+"""An in-process stand-in for the MediaWiki API used by the tests."""
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from socket import create_server
+from threading import Lock, Thread
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlencode
+
+
+class FakeResponse:
+    __slots__ = '_json', 'headers', 'content', 'request'
+    status_code = 200
+
+    def __init__(self, json: dict, headers: dict = None, body: str = None):
+        self._json = json
+        self.headers = {} if headers is None else headers
+        self.content = dumps(json).encode()
+        self.request = SimpleNamespace(body=body)
+
+    def json(self):
+        return self._json
+
+
+def _limit(value, default=10) -> int:
+    if value is None:
+        return default
+    return 500 if value == 'max' else int(value)
+
+
+def _file_bytes(file) -> bytes:
+    if isinstance(file, tuple):  # (filename, content)
+        file = file[1]
+    return file.read() if hasattr(file, 'read') else bytes(file)
+
+
+class FakeWiki:
+    """Answer API requests from in-memory data.
+
+    Use an instance as the `_post` attribute of an `API` object, or serve it
+    over HTTP using `FakeWikiServer`.
+
+    Supported modules: `list=recentchanges`, `list=allpages` over
+    `page_count` synthetic pages named `P1`, `P2`, ..., `prop=info`,
+    `prop=categories` with `categories_per_page` categories for each page,
+    `meta=tokens`, and chunked `action=upload`.
+    Every `maxlag_every`-th request fails with a maxlag error and more than
+    `max_values` titles fail with a toomanyvalues error.
+    """
+
+    def __init__(self):
+        self.recentchanges: list[dict] = []  # oldest first
+        self.requests: list[dict] = []
+        self.page_count = 0
+        self.categories_per_page = 0
+        self.max_values = 50
+        self.maxlag_every = 0
+        self.stash: dict[str, int] = {}  # filekey -> stashed size
+        self._lock = Lock()
+
+    def __call__(self, *, data, params=None, files=None) -> FakeResponse:
+        data = dict(data)
+        if files is not None:
+            files = {k: _file_bytes(v) for k, v in files.items()}
+        json, headers = self.respond(data, files)
+        return FakeResponse(json, headers, urlencode(data))
+
+    def respond(self, data: dict, files: dict = None) -> tuple[dict, dict]:
+        """Return the JSON and the headers of the response to `data`."""
+        with self._lock:
+            self.requests.append(data)
+            count = len(self.requests)
+        if (every := self.maxlag_every) and count % every == 0:
+            return {'errors': [{
+                'code': 'maxlag', 'text': 'Waiting for a database server.',
+                'module': 'main'}]}, {'retry-after': '0'}
+        return self.handle(data, files), {}
+
+    def handle(self, data: dict, files: dict = None) -> dict:
+        if len(titles := (data.get('titles') or '').split('|')) > \
+                (limit := self.max_values):
+            return {'errors': [{
+                'code': 'toomanyvalues',
+                'text': f'Too many values supplied for parameter "titles". '
+                        f'The limit is {limit}.',
+                'data': {'limit': limit}, 'module': 'main'}]}
+        action = data.get('action')
+        if action == 'upload':
+            return self.upload(data, files)
+        if action != 'query':
+            return self.unsupported()
+        if (meta := data.get('meta')) == 'tokens':
+            return {'batchcomplete': True, 'query': {'tokens': {
+                f'{t}token': '+\\' for t in data['type'].split('|')}}}
+        if (list_ := data.get('list')) == 'recentchanges':
+            return self.list_recentchanges(data)
+        if list_ == 'allpages':
+            return self.list_allpages(data)
+        if (prop := data.get('prop')) == 'info' and meta is list_ is None:
+            return {'batchcomplete': True, 'query': {'pages': [{
+                'pageid': i, 'ns': 0, 'title': title, 'lastrevid': i,
+                'length': 100, 'touched': '2020-01-01T00:00:00Z',
+            } for i, title in enumerate(titles, 1)]}}
+        if prop == 'categories' and meta is list_ is None:
+            return self.prop_categories(data, titles)
+        return self.unsupported()
+
+    @staticmethod
+    def unsupported() -> dict:
+        return {'errors': [{
+            'code': 'badvalue', 'text': 'Not supported by FakeWiki.',
+            'module': 'main'}]}
+
+    def add_changes(self, n: int, start: str = None, step: float = 1.):
+        """Add `n` edits, `step` seconds apart, after the last change."""
+        changes = self.recentchanges
+        if start is None:
+            start = changes[-1]['timestamp'] if changes else \
+                '2020-01-01T00:00:00Z'
+        time = datetime.strptime(start, '%Y-%m-%dT%H:%M:%SZ')
+        rcid = changes[-1]['rcid'] if changes else 0
+        for i in range(1, n + 1):
+            changes.append({
+                'type': 'edit', 'rcid': rcid + i, 'title': f'P{rcid + i}',
+                'timestamp': (time + timedelta(seconds=step * i)).strftime(
+                    '%Y-%m-%dT%H:%M:%SZ')})
+
+    def list_recentchanges(self, data: dict) -> dict:
+        limit = data.get('rclimit', 10)
+        limit = 500 if limit == 'max' else int(limit)
+        newer = data.get('rcdir', 'older') == 'newer'
+        changes = self.recentchanges if newer else self.recentchanges[::-1]
+        if (start := data.get('rcstart')) is not None:
+            changes = [
+                c for c in changes
+                if (c['timestamp'] >= start if newer
+                    else c['timestamp'] <= start)]
+        if (rccontinue := data.get('rccontinue')) is not None:
+            rcid = int(rccontinue.partition('|')[2])
+            changes = [
+                c for c in changes
+                if (c['rcid'] >= rcid if newer else c['rcid'] <= rcid)]
+        json = {'batchcomplete': True, 'query': {
+            'recentchanges': changes[:limit]}}
+        if len(changes) > limit:
+            json['continue'] = {
+                'rccontinue': f"{(c := changes[limit])['timestamp']}"
+                              f"|{c['rcid']}",
+                'continue': '-||'}
+        return json
+
+    def list_allpages(self, data: dict) -> dict:
+        limit = _limit(data.get('aplimit'))
+        start = int(data.get('apcontinue', 'P1')[1:])
+        stop = min(start + limit, self.page_count + 1)
+        json = {'batchcomplete': True, 'query': {'allpages': [
+            {'pageid': i, 'ns': 0, 'title': f'P{i}'}
+            for i in range(start, stop)]}}
+        if stop <= self.page_count:
+            json['continue'] = {'apcontinue': f'P{stop}', 'continue': '-||'}
+        return json
+
+    def prop_categories(self, data: dict, titles: list[str]) -> dict:
+        n = self.categories_per_page
+        pages = [
+            {'pageid': i, 'ns': 0, 'title': title}
+            for i, title in enumerate(titles, 1)]
+        if (clcontinue := data.get('clcontinue')) is not None:
+            page_index, category_index = map(int, clcontinue.split('|'))
+        else:
+            page_index = category_index = 0
+        remaining = _limit(data.get('cllimit'))
+        while page_index < len(pages) and remaining:
+            stop = min(n, category_index + remaining)
+            pages[page_index]['categories'] = [
+                {'ns': 14, 'title': f'Category:C{j}'}
+                for j in range(category_index, stop)]
+            remaining -= stop - category_index
+            if stop == n:
+                page_index, category_index = page_index + 1, 0
+            else:
+                category_index = stop
+        json = {'query': {'pages': pages}}
+        if page_index < len(pages):
+            json['continue'] = {
+                'clcontinue': f'{page_index}|{category_index}',
+                'continue': '||'}
+        else:
+            json['batchcomplete'] = True
+        return json
+
+    def upload(self, data: dict, files: dict = None) -> dict:
+        if data.get('token') != '+\\':
+            return {'errors': [{
+                'code': 'badtoken', 'text': 'Invalid CSRF token.',
+                'module': 'upload'}]}
+        filename = data['filename']
+        if 'stash' not in data:
+            return {'upload': {'result': 'Success', 'filename': filename}}
+        filekey = data.get('filekey') or f'{filename}.stash'
+        offset = int(data['offset'])
+        if offset != self.stash.get(filekey, 0):
+            return {'errors': [{
+                'code': 'stashfailed', 'text': 'Invalid offset.',
+                'module': 'upload'}]}
+        self.stash[filekey] = offset = offset + len(files['chunk'])
+        if offset < int(data['filesize']):
+            return {'upload': {
+                'result': 'Continue', 'offset': offset, 'filekey': filekey}}
+        return {'upload': {'result': 'Success', 'filekey': filekey}}
+
+
+def _parse_body(content_type: str, body: bytes) -> tuple[dict, dict]:
+    if not content_type.startswith('multipart/form-data'):
+        return dict(parse_qsl(body.decode(), keep_blank_values=True)), None
+    data, files = {}, {}
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if part.get_filename() is None:
+            data[name] = part.get_content()
+        else:
+            files[name] = part.get_payload(decode=True)
+    return data, files
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        data, files = _parse_body(
+            self.headers['Content-Type'],
+            self.rfile.read(int(self.headers['Content-Length'])))
+        json, headers = self.server.wiki.respond(data, files)
+        content = dumps(json).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *_):
+        pass
+
+
+class FakeWikiServer(ThreadingHTTPServer):
+    """Serve a `FakeWiki` over HTTP on a free local port.
+
+    Use as a context manager; `url` is the API endpoint.
+    """
+    daemon_threads = True
+
+    def __init__(self, wiki: FakeWiki = None):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.wiki = FakeWiki() if wiki is None else wiki
+        self.url = f'http://127.0.0.1:{self.server_port}/w/api.php'
+
+    def __enter__(self) -> 'FakeWikiServer':
+        Thread(
+            target=self.serve_forever, args=(.01,), daemon=True).start()
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeWikiH2Server:
+    """Serve a `FakeWiki` over cleartext HTTP/2 (h2c with prior knowledge).
+
+    Requires `h2`. Use as a context manager; `url` is the API endpoint and
+    `connections` counts the accepted TCP connections.
+    """
+
+    def __init__(self, wiki: FakeWiki = None):
+        self.wiki = FakeWiki() if wiki is None else wiki
+        self.socket = create_server(('127.0.0.1', 0))
+        self.url = f'http://127.0.0.1:{self.socket.getsockname()[1]}' \
+            f'/w/api.php'
+        self.connections = 0
+
+    def __enter__(self) -> 'FakeWikiH2Server':
+        Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def __exit__(self, *_):
+        self.socket.close()
+
+    def _serve(self):
+        while True:
+            try:
+                sock, _ = self.socket.accept()
+            except OSError:  # closed
+                return
+            self.connections += 1
+            Thread(target=self._handle, args=(sock,), daemon=True).start()
+
+    def _handle(self, sock):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import DataReceived, RequestReceived, StreamEnded
+
+        conn = H2Connection(H2Configuration(
+            client_side=False, header_encoding='utf8'))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        streams = {}
+        with sock:
+            while received := sock.recv(1 << 16):
+                for event in conn.receive_data(received):
+                    if isinstance(event, RequestReceived):
+                        streams[event.stream_id] = dict(event.headers), []
+                    elif isinstance(event, DataReceived):
+                        streams[event.stream_id][1].append(event.data)
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, StreamEnded):
+                        headers, body = streams.pop(event.stream_id)
+                        self._respond(
+                            conn, event.stream_id, headers, b''.join(body))
+                sock.sendall(conn.data_to_send())
+
+    def _respond(self, conn, stream_id: int, headers: dict, body: bytes):
+        data, files = _parse_body(headers['content-type'], body)
+        json, extra_headers = self.wiki.respond(data, files)
+        content = dumps(json).encode()
+        conn.send_headers(stream_id, [
+            (':status', '200'), ('content-type', 'application/json'),
+            ('content-length', f'{len(content)}'), *extra_headers.items()])
+        size = conn.max_outbound_frame_size
+        for i in range(0, len(content), size):
+            conn.send_data(stream_id, content[i:i + size])
+        conn.end_stream(stream_id)
@@ -1,12 +1,17 @@
+from array import array
+from datetime import datetime
 from io import BytesIO
 from json import loads as json_loads
 from pprint import pformat
-from unittest.mock import call, patch, mock_open
+from threading import Event
+from unittest.mock import Mock, call, patch, mock_open
 
 from pytest import fixture, raises
+from requests.models import RequestEncodingMixin
 
 # noinspection PyProtectedMember
-from pymw import API, LoginError, APIError, _api
+from pymw import API, AdaptiveLimit, LoginError, APIError, Checkpoint, _api, \
+    key_ranges, record_type, time_windows
 # noinspection PyProtectedMember
 from pymw._api import get_lgname_lgpass, load_config
 
@@ -735,3 +740,288 @@ def test_config_limit(_):
     test_api.login()
     assert test_api.user == 'TestUser'
     assert test_api.limit == 500
+
+
+def fake_allpages_list(_, list_, params):
+    assert list_ == 'allpages'
+    start, stop = params.get('apfrom', 'a'), params.get('apto', 'z')
+    for c in 'abcdefghijklmnopqrstuvwxyz':
+        if start <= c <= stop:
+            yield {'title': c}
+
+
+@patch.object(API, 'list', fake_allpages_list)
+def test_sharded_list():
+    results = [*api.sharded_list('allpages', {}, key_ranges('ap', 'hp'))]
+    # h and p are on the boundaries and are only yielded by the next shard
+    for i, (first, last) in enumerate((('a', 'g'), ('h', 'o'), ('p', 'z'))):
+        titles = [item['title'] for shard, item in results if shard == i]
+        assert titles == [chr(c) for c in range(ord(first), ord(last) + 1)]
+
+
+@patch.object(API, 'list', fake_allpages_list)
+def test_sharded_list_boundaries():
+    # no item is on the hh boundary, the hh-hz shard is empty
+    results = [*api.sharded_list(
+        'allpages', {}, key_ranges('ap', ('hh', 'hz', 'p')))]
+    assert sorted(item['title'] for _, item in results) == [
+        *'abcdefghijklmnopqrstuvwxyz']
+    assert [item['title'] for shard, item in results if shard == 0] == [
+        *'abcdefgh']
+    assert not any(shard == 1 for shard, _ in results)
+
+
+def test_sharded_list_error():
+    def list_(_, __, params):
+        if 'apfrom' in params:
+            raise APIError('shard failed')
+        yield {}
+
+    with patch.object(API, 'list', list_), raises(APIError):
+        for _ in api.sharded_list('allpages', {}, key_ranges('ap', 'h')):
+            pass
+
+
+def test_sharded_list_close_stops_workers():
+    stopped = Event()
+
+    def list_(_, __, ___):
+        try:
+            while True:
+                yield {}
+        finally:
+            stopped.set()
+
+    with patch.object(API, 'list', list_):
+        shards = api.sharded_list(
+            'allpages', {}, key_ranges('ap', 'h'), buffer_size=1)
+        next(shards)
+        shards.close()
+    assert stopped.is_set()
+
+
+def test_key_ranges():
+    assert key_ranges('ap', ('H', 'P')) == [
+        {'apto': 'H'}, {'apfrom': 'H', 'apto': 'P'}, {'apfrom': 'P'}]
+    assert key_ranges('ap', ()) == [{}]
+
+
+def test_time_windows():
+    assert time_windows(
+        'rc', datetime(2020, 1, 1), datetime(2020, 1, 1, 0, 0, 3), 2
+    ) == [
+        {'rcdir': 'newer', 'rcstart': '2020-01-01T00:00:00Z',
+         'rcend': '2020-01-01T00:00:00Z'},
+        {'rcdir': 'newer', 'rcstart': '2020-01-01T00:00:01Z',
+         'rcend': '2020-01-01T00:00:03Z'}]
+
+
+rc_call_returns = (
+    call({'action': 'query', 'list': ('recentchanges',), 'rclimit': 1}),
+    {'batchcomplete': True, 'continue': {'rccontinue': '1', 'continue': '-||'},
+     'query': {'recentchanges': [{'rcid': 2}]}},
+    call({
+        'action': 'query', 'list': ('recentchanges',), 'rclimit': 1,
+        'rccontinue': '1', 'continue': '-||'}),
+    {'batchcomplete': True, 'query': {'recentchanges': [{'rcid': 1}]}})
+
+
+@api_post_patch(*rc_call_returns)
+def test_checkpoint_resume_list(_):
+    checkpoint = Checkpoint()
+    rcs = api.list('recentchanges', {'rclimit': 1}, checkpoint=checkpoint)
+    assert next(rcs) == {'rcid': 2}
+    assert checkpoint.to_dict() == {'offset': 0, 'continue': None}
+    assert next(rcs) == {'rcid': 1}  # fetches the second response
+    assert checkpoint.to_dict() == {
+        'offset': 0, 'continue': {'rccontinue': '1', 'continue': '-||'}}
+    rcs.close()  # interrupted
+    resumed = Checkpoint(0, checkpoint.continue_)
+    # only the second response is requested again
+    with api_post_patch(*rc_call_returns[2:]):
+        assert [*api.list(
+            'recentchanges', {'rclimit': 1}, checkpoint=resumed)] == [
+            {'rcid': 1}]
+    assert resumed.to_dict() == {'offset': 1, 'continue': None}
+
+
+@api_post_patch(
+    call({'action': 'query', 'titles': ('2', '3'), 'c': '1'}),
+    {'batchcomplete': True, 'continue': {'c': '2'}},
+    call({'action': 'query', 'titles': ('2', '3'), 'c': '2'}), {},
+    call({'action': 'query', 'titles': ('4',)}), {},
+)
+def test_checkpoint_resume_chunk(_, cleared_api, tmp_path):
+    cleared_api.limit = 2
+    path = tmp_path / 'checkpoint.json'
+    path.write_text('{"offset": 2, "continue": {"c": "1"}}')
+    checkpoint = Checkpoint.load(path, interval=0)
+    for _ in cleared_api.post_and_continue({
+            'action': 'query', 'titles': (f'{t}' for t in range(5))},
+            checkpoint=checkpoint):
+        pass
+    assert Checkpoint.load(path).to_dict() == {'offset': 5, 'continue': None}
+
+
+@api_post_patch(
+    call({'action': 'query', 'titles': ('2', '3', '4'), 'c': '1'}), {},
+    call({'action': 'query', 'titles': ('5', '6', '7')}), {},
+)
+def test_checkpoint_resume_with_another_limit(_, cleared_api):
+    # saved while the limit was 2, e.g. before login
+    checkpoint = Checkpoint(2, {'c': '1'})
+    cleared_api.limit = 3
+    for _ in cleared_api.post_and_continue({
+            'action': 'query', 'titles': (f'{t}' for t in range(8))},
+            checkpoint=checkpoint):
+        pass
+    assert checkpoint.to_dict() == {'offset': 8, 'continue': None}
+
+
+def test_checkpoint_load_missing_file(tmp_path):
+    checkpoint = Checkpoint.load(tmp_path / 'missing.json')
+    assert checkpoint.to_dict() == {'offset': 0, 'continue': None}
+
+
+@api_post_patch(
+    any, {'continue': {'llcontinue': '1|b', 'continue': '||'}, 'query': {
+        'pages': [{'pageid': 1, 'langlinks': [{'lang': 'a'}]}]}},
+    any, {'batchcomplete': True, 'query': {'pages': [
+        {'pageid': 1, 'langlinks': [{'lang': 'b'}]}]}})
+def test_prop_checkpoint_only_on_batch_complete(_):
+    checkpoint = Checkpoint()
+    pages = api.prop('langlinks', {}, checkpoint=checkpoint)
+    assert next(pages) == {
+        'pageid': 1, 'langlinks': [{'lang': 'a'}, {'lang': 'b'}]}
+    # the first, incomplete, batch did not move the checkpoint
+    assert checkpoint.to_dict() == {'offset': 0, 'continue': None}
+    assert next(pages, None) is None
+    assert checkpoint.to_dict() == {'offset': 1, 'continue': None}
+
+
+def search_response(n, limits=None):
+    json = {'batchcomplete': True, 'continue': {
+        'sroffset': n, 'continue': '-||'}, 'query': {'search': [{}] * n}}
+    if limits is not None:
+        json['limits'] = limits
+    return json
+
+
+@patch('pymw._api.perf_counter', side_effect=(0, 4, 10, 11, 20, 20.5, 30, 31))
+@api_post_patch(
+    call({'action': 'query', 'list': ('search',), 'srlimit': 'max'}),
+    search_response(500, {'search': 500}),
+    # 4 seconds > 1 second target, shrink at most twofold
+    call({
+        'action': 'query', 'list': ('search',), 'srlimit': 250,
+        'sroffset': 500, 'continue': '-||'}),
+    search_response(250),
+    call({  # on target
+        'action': 'query', 'list': ('search',), 'srlimit': 250,
+        'sroffset': 250, 'continue': '-||'}),
+    search_response(250),
+    call({  # grows, but never over the maximum
+        'action': 'query', 'list': ('search',), 'srlimit': 500,
+        'sroffset': 250, 'continue': '-||'}),
+    {'batchcomplete': True, 'query': {'search': [{}]}})
+def test_adaptive_limit(_, __):
+    adaptive = AdaptiveLimit('srlimit', 1)
+    assert sum(1 for _ in api.list('search', {}, adaptive=adaptive)) == 1001
+    assert adaptive.maximum == 500
+
+
+def test_adaptive_limit_max_size():
+    adaptive = AdaptiveLimit('rvlimit', 10, max_size=1000)
+    adaptive.prepare(data := {'rvlimit': 40})
+    adaptive.update(data, {}, 1, 4000)
+    assert data['rvlimit'] == adaptive.limit == 20  # at most twofold
+    adaptive.update(data, {}, 1, 1200)
+    assert adaptive.limit == 16
+    adaptive.update(data, {}, 1, 100)
+    assert adaptive.limit == 32
+    adaptive.update(data, {}, 1, 100)
+    assert adaptive.limit == 40  # initial value is the maximum
+
+
+@api_post_patch(
+    call({
+        'action': 'query', 'list': ('allusers', 'allcategories'),
+        'meta': ('siteinfo',), 'siprop': 'general'}),
+    {'continue': {
+        'aufrom': 'B', 'accontinue': 'X', 'continue': '-||siteinfo'},
+        'query': {
+            'general': {'sitename': 'W'},
+            'allusers': [{'name': 'A'}], 'allcategories': [{'title': 'W'}]}},
+    call({
+        'action': 'query', 'list': ('allusers', 'allcategories'),
+        'siprop': 'general', 'aufrom': 'B', 'accontinue': 'X',
+        'continue': '-||siteinfo'}),
+    {'continue': {'accontinue': 'Y', 'continue': '-||allusers|siteinfo'},
+     'query': {'allusers': [{'name': 'B'}], 'allcategories': [{'title': 'X'}]}},
+    call({
+        'action': 'query', 'list': ('allcategories',), 'siprop': 'general',
+        'accontinue': 'Y', 'continue': '-||allusers|siteinfo'}),
+    {'batchcomplete': True, 'query': {'allcategories': [{'title': 'Y'}]}})
+def test_query_modules(post_mock):
+    results = api.query_modules(
+        {'siprop': 'general'}, ('allusers', 'allcategories'), ('siteinfo',))
+    assert [*results['siteinfo']] == [{'general': {'sitename': 'W'}}]
+    assert post_mock.call_count == 1
+    assert [*results['allusers']] == [{'name': 'A'}, {'name': 'B'}]
+    assert post_mock.call_count == 2
+    assert [*results['allcategories']] == [
+        {'title': 'W'}, {'title': 'X'}, {'title': 'Y'}]
+
+
+def test_form_encoder():
+    encode = _api._FormEncoder()
+    titles = '|'.join(f'T {i}&é' for i in range(100))
+    data = {
+        'action': 'query', 'titles': titles, 'maxlag': 5, 'bot': True,
+        'b': b'\xff', 'ignorewarnings': None, 'ids': (1, 2)}
+    encoded = encode(data)
+    assert encoded == RequestEncodingMixin._encode_params(data)
+    with patch.object(_api, 'urlencode', side_effect=_api.urlencode) as m:
+        data['continue'] = '-||'
+        assert encode(data) == encoded + '&continue=-%7C%7C'
+    # only the new str value and the non-str values are encoded again
+    assert [c.args[0][0][0] for c in m.mock_calls] == [
+        'maxlag', 'bot', 'b', 'ids', 'continue']
+
+
+def test_request_form():
+    request = Mock()
+    encode = _api._FormEncoder()
+    _api._request_form(request, url, encode, data={'a': 'b'})
+    request.assert_called_once_with(
+        'POST', url, params=None, data='a=b', headers=_api._FORM_HEADERS)
+    request.reset_mock()
+    files = {'file': ('F.jpg', b'')}
+    _api._request_form(request, url, encode, data={'a': 'b'}, files=files)
+    request.assert_called_once_with(
+        'POST', url, params=None, data={'a': 'b'}, files=files)
+
+
+allpages_responses = (
+    any, {'batchcomplete': True, 'continue': {
+        'apcontinue': 'B', 'continue': '-||'}, 'query': {'allpages': [
+            {'pageid': 1, 'ns': 0, 'title': 'A'},
+            {'pageid': 2, 'ns': 0, 'title': 'AB'}]}},
+    any, {'batchcomplete': True, 'query': {'allpages': [
+        {'ns': 0, 'title': 'B'}]}})
+
+
+@api_post_patch(*allpages_responses)
+def test_list_records(_):
+    records = [*api.list_records('allpages', {}, ('pageid', 'title'))]
+    assert records == [(1, 'A'), (2, 'AB'), (None, 'B')]
+    assert records[0].title == 'A'
+    assert type(records[0]) is record_type(('pageid', 'title'))
+    assert not hasattr(records[0], '__dict__')
+
+
+@api_post_patch(*allpages_responses)
+def test_list_columns(_):
+    batch1, batch2 = api.list_columns('allpages', {}, ('pageid', 'title'))
+    assert batch1 == {'pageid': array('q', (1, 2)), 'title': ['A', 'AB']}
+    assert batch2 == {'pageid': [None], 'title': ['B']}
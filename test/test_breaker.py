@@ -0,0 +1,149 @@
+from socket import socket
+from unittest.mock import patch
+
+from pytest import fixture, importorskip, raises
+from requests import ConnectionError
+
+from fakewiki import FakeResponse
+from pymw import API, CircuitBreaker, CircuitBreakerTransport, \
+    CircuitOpenError, HTTPXTransport, add_circuit_breaker
+
+
+class FlakyTransport:
+
+    def __init__(self):
+        self.outcomes = []  # exceptions or status codes, default is 200
+        self.calls = 0
+
+    def __call__(self, *, data, params=None, files=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, BaseException):
+            raise outcome
+        resp = StatusResponse({'batchcomplete': True})
+        resp.status_code = outcome
+        return resp
+
+
+class StatusResponse(FakeResponse):
+    pass
+
+
+@fixture
+def clock():
+    clock = [0.]
+    with patch('pymw._breaker.monotonic', lambda: clock[0]):
+        yield clock
+    CircuitBreaker._registry.clear()
+
+
+def test_circuit_breaker(clock):
+    transport = FlakyTransport()
+    api = API('https://a.example/w/api.php', transport=transport)
+    breaker = add_circuit_breaker(api, failure_threshold=3, reset_timeout=10)
+    assert breaker.state == 'closed'
+    transport.outcomes += [ConnectionError(), 503, ConnectionError()]
+    for _ in range(3):
+        try:
+            api.post({'action': 'query'})
+        except ConnectionError:
+            pass
+    assert breaker.state == 'open'
+    with raises(CircuitOpenError):
+        api.post({'action': 'query'})
+    assert transport.calls == 3  # failed fast
+    assert CircuitBreaker.health() == {'https://a.example/w/api.php': 'open'}
+    # a failed probe opens the circuit again
+    clock[0] = 10.
+    assert breaker.state == 'half-open'
+    transport.outcomes.append(ConnectionError())
+    with raises(ConnectionError):
+        api.post({'action': 'query'})
+    assert breaker.state == 'open'
+    # a successful probe closes it
+    clock[0] = 20.
+    assert api.post({'action': 'query'}) == {'batchcomplete': True}
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+
+
+def test_successes_reset_failures(clock):
+    transport = FlakyTransport()
+    api = API('https://b.example/w/api.php', transport=transport)
+    breaker = add_circuit_breaker(api, failure_threshold=2)
+    transport.outcomes += [ConnectionError(), 200, ConnectionError()]
+    for _ in range(3):
+        try:
+            api.post({'action': 'query'})
+        except ConnectionError:
+            pass
+    assert breaker.state == 'closed'
+
+
+def test_breakers_are_shared_per_url(clock):
+    a1 = API('https://a.example/w/api.php', transport=FlakyTransport())
+    a2 = API('https://a.example/w/api.php', transport=FlakyTransport())
+    b = API('https://b.example/w/api.php', transport=FlakyTransport())
+    breaker = add_circuit_breaker(a1, failure_threshold=1)
+    assert add_circuit_breaker(a2) is breaker
+    add_circuit_breaker(b)
+    a1.transport.transport.outcomes.append(ConnectionError())
+    with raises(ConnectionError):
+        a1.post({'action': 'query'})
+    with raises(CircuitOpenError):
+        a2.post({'action': 'query'})
+    assert b.post({'action': 'query'}) == {'batchcomplete': True}
+    assert CircuitBreaker.health() == {
+        'https://a.example/w/api.php': 'open',
+        'https://b.example/w/api.php': 'closed'}
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker('https://c.example', failure_threshold=1)
+    breaker.record_failure()
+    clock[0] = 30.
+    breaker.before_request()  # the probe
+    with raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.release_probe()
+    breaker.before_request()
+
+
+def test_any_transport_exception_is_a_failure(clock):
+    transport = FlakyTransport()
+    breaker = CircuitBreaker('https://d.example', failure_threshold=2)
+    guarded = CircuitBreakerTransport(transport, breaker)
+    transport.outcomes += [ValueError(), KeyboardInterrupt()]
+    with raises(ValueError):
+        guarded(data={})
+    with raises(KeyboardInterrupt):  # not a failure
+        guarded(data={})
+    assert (breaker.failures, breaker.state) == (1, 'closed')
+    # a nested open breaker does not fail the probe of the outer one
+    inner = CircuitBreaker(
+        'https://d.example/inner', failure_threshold=1, reset_timeout=60)
+    inner.record_failure()
+    breaker.failure_threshold = 1
+    guarded.transport = CircuitBreakerTransport(transport, inner)
+    breaker.record_failure()
+    clock[0] = 30.
+    with raises(CircuitOpenError):
+        guarded(data={})
+    assert breaker.failures == 2
+    breaker.before_request()  # the probe was released
+
+
+def test_httpx_transport_errors(clock):
+    importorskip('httpx')
+    with socket() as s:  # a port that refuses connections
+        s.bind(('127.0.0.1', 0))
+        url = f'http://127.0.0.1:{s.getsockname()[1]}/w/api.php'
+    with HTTPXTransport(url) as transport, \
+            API(url, transport=transport) as api:
+        breaker = add_circuit_breaker(api, failure_threshold=2)
+        for _ in range(2):
+            with raises(ConnectionError):
+                api.post({'action': 'query'})
+        assert breaker.state == 'open'
+        with raises(CircuitOpenError):
+            api.post({'action': 'query'})
@@ -0,0 +1,112 @@
+from hashlib import sha1
+from io import BytesIO
+from threading import Lock
+from unittest.mock import patch
+
+from pytest import fixture, raises
+from requests import ConnectionError, Response
+
+from pymw import API, PYMWError, download, download_files
+
+
+CONTENT = bytes(range(256)) * 100
+SHA1 = sha1(CONTENT).hexdigest()
+
+
+@fixture
+def api():
+    return API('https://commons.wikimedia.org/w/api.php')
+
+
+class FakeServer:
+
+    def __init__(self, failures=0, ranges=True):
+        self.failures = failures
+        self.ranges = ranges
+        self.requests = []
+        self.lock = Lock()
+
+    def get(self, url, headers, stream):
+        assert stream is True
+        assert headers['Accept-Encoding'] == 'identity'
+        with self.lock:
+            self.requests.append((url, headers.get('Range')))
+        resp = Response()
+        resp.url = url
+        resp.status_code = 200
+        content = CONTENT
+        if self.ranges and (range_ := headers.get('Range')):
+            resp.status_code = 206
+            content = content[int(range_[6:-1]):]
+        if self.failures:
+            self.failures -= 1
+            resp.raw = FailingReader(content[:1000])
+        else:
+            resp.raw = BytesIO(content)
+        return resp
+
+
+class FailingReader(BytesIO):
+
+    def read(self, *args):
+        if data := super().read(*args):
+            return data
+        raise ConnectionError
+
+
+@patch('pymw._download.sleep')
+def test_download_resumes_after_failure(sleep, api, tmp_path):
+    server = FakeServer(failures=1)
+    with patch.object(api.session, 'get', server.get):
+        path = download(
+            api, 'https://u/F.bin', tmp_path / 'F.bin', size=len(CONTENT),
+            sha1=SHA1, buffer_size=300)
+    assert path.read_bytes() == CONTENT
+    assert not (tmp_path / 'F.bin.part').exists()
+    assert server.requests == [
+        ('https://u/F.bin', None), ('https://u/F.bin', 'bytes=1000-')]
+    sleep.assert_called_once_with(1)
+
+
+def test_download_without_range_support(api, tmp_path):
+    (tmp_path / 'F.bin.part').write_bytes(CONTENT[:500])
+    with patch.object(api.session, 'get', FakeServer(ranges=False).get):
+        download(api, 'https://u/F.bin', tmp_path / 'F.bin', sha1=SHA1)
+    assert (tmp_path / 'F.bin').read_bytes() == CONTENT
+
+
+def test_download_complete_part(api, tmp_path):
+    (tmp_path / 'F.bin.part').write_bytes(CONTENT)
+    server = FakeServer()
+    with patch.object(api.session, 'get', server.get):
+        download(
+            api, 'https://u/F.bin', tmp_path / 'F.bin', size=len(CONTENT),
+            sha1=SHA1)
+    assert server.requests == []
+    assert (tmp_path / 'F.bin').read_bytes() == CONTENT
+
+
+def test_download_sha1_mismatch(api, tmp_path):
+    (tmp_path / 'F.bin.part').write_bytes(b'x' * 500)
+    with patch.object(api.session, 'get', FakeServer().get), \
+            raises(PYMWError, match='SHA-1 mismatch'):
+        download(api, 'https://u/F.bin', tmp_path / 'F.bin', sha1=SHA1)
+    assert not (tmp_path / 'F.bin.part').exists()
+    assert not (tmp_path / 'F.bin').exists()
+
+
+def test_download_files(api, tmp_path):
+    server = FakeServer()
+    pages = [{'title': f'File:F {i}.bin', 'imageinfo': [{
+        'url': f'https://h{i % 2}/F_{i}.bin', 'size': len(CONTENT),
+        'sha1': SHA1}]} for i in range(5)]
+    pages.append({'title': 'File:Missing.bin', 'missing': True})
+    with patch.object(api.session, 'get', server.get):
+        results = {page['title']: result for page, result in download_files(
+            api, pages, tmp_path / 'files', workers=3, max_per_host=1)}
+    assert isinstance(results.pop('File:Missing.bin'), PYMWError)
+    assert results == {
+        f'File:F {i}.bin': tmp_path / 'files' / f'F_{i}.bin'
+        for i in range(5)}
+    assert all(p.read_bytes() == CONTENT for p in results.values())
+    assert len(server.requests) == 5
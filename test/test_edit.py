@@ -0,0 +1,126 @@
+from threading import Lock
+from unittest.mock import patch
+
+from pytest import fixture
+
+from pymw import API, APIError, TokenBucket, bulk_edit, stash_edit
+
+
+@fixture
+def api():
+    api = API('https://www.mediawiki.org/w/api.php')
+    api.tokens['csrf'] = 'T1'
+    return api
+
+
+def error(code, module='edit'):
+    return APIError([{'code': code, 'text': '', 'module': module}])
+
+
+def test_token_bucket_from_ratelimits():
+    assert TokenBucket.from_ratelimits({}) is None
+    bucket = TokenBucket.from_ratelimits({'edit': {
+        'user': {'hits': 90, 'seconds': 60},
+        'newbie': {'hits': 8, 'seconds': 60}}})
+    assert bucket.capacity == 8
+    assert bucket.rate == 8 / 60
+
+
+def test_token_bucket_acquire():
+    clock = [0.]
+    sleeps = []
+    with patch('pymw._edit.monotonic', lambda: clock[0]), \
+            patch('pymw._edit.sleep', sleeps.append):
+        bucket = TokenBucket(rate=2, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        assert sleeps == []
+        bucket.acquire()
+        bucket.acquire()
+        assert sleeps == [.5, 1.]  # reserved future tokens
+        clock[0] = 10.
+        bucket.acquire()
+        assert sleeps == [.5, 1.]  # refilled, but not over the capacity
+        bucket.acquire()
+        bucket.acquire()
+        assert sleeps == [.5, 1., .5]
+
+
+def test_bulk_edit(api):
+    lock = Lock()
+    posted = []
+    errors = {'B': [error('badtoken')], 'C': [error('editconflict')] * 2,
+              'D': [error('protectedpage')]}
+
+    def post(_, data):
+        with lock:
+            posted.append(data)
+            if errors.get(data['title']):
+                raise errors[data['title']].pop()
+        return {'edit': {'result': 'Success', 'title': data['title']}}
+
+    def on_conflict(edit):
+        if edit['text'] == 'rebased':
+            return None
+        return edit | {'text': 'rebased'}
+
+    with patch.object(API, 'post', post):
+        results = {edit['title']: result for edit, result in bulk_edit(
+            api, ({'title': t, 'text': t} for t in 'ABCD'), workers=2,
+            bucket=TokenBucket(1000, 1000), on_conflict=on_conflict)}
+    assert results['A'] == {'result': 'Success', 'title': 'A'}
+    assert results['B'] == {'result': 'Success', 'title': 'B'}
+    assert isinstance(results['C'], APIError)  # gave up after one rebase
+    assert isinstance(results['D'], APIError)  # not retried
+    assert sorted((d['title'], d['text']) for d in posted) == [
+        ('A', 'A'), ('B', 'B'), ('B', 'B'), ('C', 'C'), ('C', 'rebased'),
+        ('D', 'D')]
+    assert all(d['action'] == 'edit' for d in posted)
+
+
+def test_bulk_edit_ratelimits(api):
+    with patch.object(API, 'meta', return_value={'ratelimits': {}}) as meta, \
+            patch.object(API, 'post', return_value={'edit': {}}):
+        assert [*bulk_edit(api, [{'title': 'A'}])] == [({'title': 'A'}, {})]
+    meta.assert_called_once_with('userinfo', {'uiprop': 'ratelimits'})
+
+
+def test_badtoken_invalidates_shared_token_once(api):
+    api._handle_badtoken_error(None, {}, {'module': 'edit'})
+    api._handle_badtoken_error(None, {}, {'module': 'edit'})
+    assert 'csrf' not in api.tokens
+
+
+def test_stash_edit(api):
+    posted = []
+
+    def post(_, data):
+        posted.append(data)
+        if data['action'] == 'stashedit':
+            return {'stashedit': {'status': 'stashed', 'texthash': 'H'}}
+        return {'edit': {'result': 'Success', 'newrevid': 2}}
+
+    with patch.object(API, 'post', post):
+        stashed = stash_edit(api, 'T', 'new text', baserevid=1, section=0)
+        assert stashed.result() == {'status': 'stashed', 'texthash': 'H'}
+        assert stashed.save(summary='S') == {
+            'result': 'Success', 'newrevid': 2}
+    common = {
+        'title': 'T', 'text': 'new text', 'baserevid': 1, 'section': 0,
+        'contentmodel': 'wikitext', 'contentformat': 'text/x-wiki'}
+    assert posted == [
+        {'action': 'stashedit'} | common,
+        {'action': 'edit'} | common | {'summary': 'S'}]
+
+
+@patch('pymw._edit.warning')
+def test_stash_failure_does_not_prevent_save(warning, api):
+    def post(_, data):
+        if data['action'] == 'stashedit':
+            raise error('missingparam', 'stashedit')
+        return {'edit': {'result': 'Success'}}
+
+    with patch.object(API, 'post', post):
+        stashed = stash_edit(api, 'T', '', baserevid=0)
+        assert stashed.save() == {'result': 'Success'}
+    warning.assert_called_once()
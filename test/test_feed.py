@@ -0,0 +1,96 @@
+from itertools import islice
+from unittest.mock import patch
+
+from fakewiki import FakeWiki
+from pytest import raises
+from requests import ConnectionError
+
+from pymw import API, RecentChangesFeed
+
+
+def fake_api():
+    api = API('https://www.mediawiki.org/w/api.php')
+    api._post = wiki = FakeWiki()
+    return api, wiki
+
+
+def test_poll_new_changes_only():
+    api, wiki = fake_api()
+    wiki.add_changes(3)
+    feed = RecentChangesFeed(api, {'rcprop': 'user|title'})
+    assert feed.params['rcprop'] == 'ids|timestamp|title|user'
+    assert feed.poll() == []  # starts after the latest change
+    assert feed.poll() == []
+    # new changes in the same second as the last seen one
+    wiki.add_changes(2, step=0)
+    wiki.add_changes(1)
+    assert [c['rcid'] for c in feed.poll()] == [4, 5, 6]
+    assert feed.rcids == {6}
+    assert feed.poll() == []
+
+
+def test_catch_up_burst_using_continuation():
+    api, wiki = fake_api()
+    wiki.add_changes(1)
+    feed = RecentChangesFeed(api)
+    feed.poll()
+    wiki.add_changes(1200, step=.25)
+    assert [c['rcid'] for c in feed.poll()] == [*range(2, 1202)]
+    assert len(wiki.requests) == 4  # latest + 3 continued requests
+    assert all(r['rclimit'] == 'max' for r in wiki.requests[1:])
+
+
+def test_failed_poll_does_not_mark_changes_as_seen():
+    api, wiki = fake_api()
+    wiki.add_changes(1)
+    feed = RecentChangesFeed(api)
+    feed.poll()
+    # in the same second as the last seen change
+    wiki.add_changes(600, step=0)
+    calls = 0
+
+    def flaky_post(**kwargs):
+        nonlocal calls
+        if (calls := calls + 1) == 2:  # the first continued request
+            raise ConnectionError
+        return wiki(**kwargs)
+
+    api._post = flaky_post
+    with raises(ConnectionError):
+        feed.poll()
+    assert feed.rcids == {1}
+    assert [c['rcid'] for c in feed.poll()] == [*range(2, 602)]
+
+
+def test_adaptive_interval():
+    api, wiki = fake_api()
+    wiki.add_changes(1)
+    feed = RecentChangesFeed(
+        api, rcstart='2020-01-01T00:00:00Z', target=10, max_interval=8)
+    clock = iter((0, 1, 2, 3, 4, 5))
+    with patch('pymw._feed.monotonic', lambda: next(clock)):
+        feed.poll()  # first poll, no rate yet
+        assert feed.interval == 2
+        wiki.add_changes(100)
+        feed.poll()  # 100 changes per second
+        assert feed.interval == 1  # min_interval
+        feed.poll()  # quiet
+        assert feed.interval == 1  # 50 changes per second on average
+        feed.poll(), feed.poll(), feed.poll()
+        assert feed.rate == 6.25
+        assert feed.interval == 1.6
+
+
+def test_iter_sleeps_between_polls():
+    api, wiki = fake_api()
+    wiki.add_changes(1)
+    feed = RecentChangesFeed(api, rcstart='2020-01-01T00:00:00Z')
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        wiki.add_changes(1)
+
+    with patch('pymw._feed.sleep', fake_sleep):
+        assert [c['rcid'] for c in islice(feed, 3)] == [1, 2, 3]
+    assert len(sleeps) == 2
@@ -0,0 +1,89 @@
+from logging import WARNING
+from unittest.mock import patch
+
+from pytest import raises
+
+from fakewiki import FakeResponse, FakeWiki
+from pymw import API, APIError, Hooks, Metrics
+
+
+def fake_api():
+    api = API('https://www.mediawiki.org/w/api.php')
+    api._post = wiki = FakeWiki()
+    return api, wiki
+
+
+def test_no_hooks():
+    api, wiki = fake_api()
+    assert api.hooks is None
+    wiki.add_changes(3)
+    assert len([*api.list('recentchanges', {'rclimit': 1})]) == 3
+
+
+def test_hooks_events():
+    api, wiki = fake_api()
+    wiki.add_changes(3)
+    events = []
+    api.hooks = hooks = Hooks()
+    for event in ('request_start', 'request_end', 'continuation'):
+        hooks.add(event, lambda event=event, **kwargs: events.append(
+            (event, kwargs)))
+    assert len([*api.list('recentchanges', {'rclimit': 2})]) == 3
+    assert [e for e, _ in events] == [
+        'request_start', 'request_end', 'request_start', 'request_end',
+        'continuation']
+    start, end = events[0][1], events[1][1]
+    assert start['api'] is api
+    assert start['data']['list'] == 'recentchanges'
+    assert end['error'] is None
+    assert end['elapsed'] >= 0
+    assert end['response'].content
+    assert events[-1][1]['depth'] == 2
+
+
+def test_token_event():
+    api, wiki = fake_api()
+    api.hooks = hooks = Hooks()
+    tokens = []
+    hooks.add('token', lambda **kwargs: tokens.append(kwargs['token_type']))
+    assert api.tokens['csrf'] == '+\\'
+    assert api.tokens['csrf'] == '+\\'
+    assert tokens == ['csrf']
+
+
+@patch('pymw._api.sleep')
+def test_metrics(sleep, caplog):
+    api, wiki = fake_api()
+    wiki.add_changes(5)
+    metrics = Metrics(slow_threshold=0).attach(api)
+    responses = iter((
+        FakeResponse({'errors': [{
+            'code': 'maxlag', 'text': '', 'module': 'main'}]},
+            {'retry-after': '2'}, 'a=1'),
+        FakeResponse({'errors': [{
+            'code': 'badvalue', 'text': '', 'module': 'main'}]},
+            body='a=2')))
+    with caplog.at_level(WARNING):
+        assert len([*api.list('recentchanges', {'rclimit': 2})]) == 5
+        api._post = lambda **_: next(responses)
+        with raises(APIError):
+            api.post({'action': 'parse', 'lgpassword': 'secret'})
+    summary = metrics.summary()
+    assert summary['requests'] == {'query': 3, 'parse': 2}
+    assert sum(summary['latencies']['query']) == 3
+    assert len(summary['latencies']['query']) == len(
+        summary['latency_buckets'])
+    assert summary['request_bytes']['parse'] == 6
+    assert summary['response_bytes']['query'] > 0
+    assert summary['errors'] == {'badvalue': 1}
+    assert summary['retries'] == {'maxlag': 1}
+    assert summary['maxlag_wait'] == 2
+    assert summary['continuations'] == {'query': 2}
+    assert summary['max_depth'] == {'query': 3}
+    slow = [r.message for r in caplog.records if 'slow request' in r.message]
+    assert len(slow) == 5
+    assert 'secret' not in ''.join(slow)
+    metrics.detach(api)
+    api._post = wiki
+    [*api.list('recentchanges', {})]
+    assert metrics.summary()['requests'] == {'query': 3, 'parse': 2}
@@ -0,0 +1,139 @@
+"""Run API methods over HTTP against a local FakeWikiServer."""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from time import sleep
+from unittest.mock import patch
+
+from pytest import fixture, importorskip
+
+from fakewiki import FakeWiki, FakeWikiH2Server, FakeWikiServer
+from pymw import API, HTTPXTransport, HedgedTransport, upload_path
+
+
+@fixture
+def server():
+    with FakeWikiServer() as server:
+        yield server
+
+
+@fixture
+def api(server):
+    with API(server.url) as api:
+        yield api
+
+
+def test_list_continuation(server, api):
+    server.wiki.page_count = 25
+    server.wiki.maxlag_every = 2
+    assert [p['pageid'] for p in api.list('allpages', {'aplimit': 10})] == [
+        *range(1, 26)]
+    # every other request failed with maxlag and was retried
+    assert len(server.wiki.requests) == 5
+
+
+def test_prop_batches_and_toomanyvalues(server, api):
+    wiki = server.wiki
+    wiki.categories_per_page = 3
+    wiki.max_values = 20
+    titles = [f'P{i}' for i in range(45)]
+    pages = [*api.prop('categories', {'titles': titles, 'cllimit': 10})]
+    assert [p['title'] for p in pages] == titles
+    assert all(len(p['categories']) == 3 for p in pages)
+    assert api.limit == 20
+
+
+def test_upload_chunks(server, api):
+    api._user = 'U'
+    content = bytes(range(256)) * 10
+    chunks = (BytesIO(content[i:i + 1000]) for i in range(0, 2560, 1000))
+    assert api.upload_chunks(
+        chunks=chunks, filename='F.bin', filesize=2560, comment='C',
+    ) == {'result': 'Success', 'filename': 'F.bin'}
+    assert server.wiki.stash == {'F.bin.stash': 2560}
+    assert server.wiki.requests[-1]['comment'] == 'C'
+
+
+def test_httpx_transport(server):
+    importorskip('httpx')
+    server.wiki.page_count = 25
+    with HTTPXTransport(server.url) as transport, \
+            API(server.url, transport=transport) as api:
+        assert [p['pageid'] for p in api.list(
+            'allpages', {'aplimit': 10})] == [*range(1, 26)]
+        assert api.tokens['csrf'] == '+\\'
+        api._user = 'U'
+        assert api.upload_file(file=BytesIO(b'x'), filename='F.bin') == {
+            'result': 'Success', 'filename': 'F.bin'}
+
+
+def test_httpx_transport_multiplexes_over_h2():
+    importorskip('h2')
+    importorskip('httpx')
+    with FakeWikiH2Server() as server, HTTPXTransport(
+        server.url, http1=False  # h2c with prior knowledge
+    ) as transport, API(server.url, transport=transport) as api:
+        server.wiki.page_count = 100
+        with ThreadPoolExecutor(10) as executor:
+            counts = [*executor.map(
+                lambda _: len([*api.list('allpages', {'aplimit': 10})]),
+                range(10))]
+        assert counts == [100] * 10
+        assert api.last_response.http_version == 'HTTP/2'
+    assert server.connections == 1
+
+
+class SlowWiki(FakeWiki):
+    """Answer the 6th request after half a second."""
+
+    def respond(self, data, files=None):
+        json, headers = super().respond(data, files)
+        if len(self.requests) == 6:
+            sleep(.5)
+        return json, headers
+
+
+def test_hedged_httpx_transport(caplog):
+    importorskip('httpx')
+    with FakeWikiServer(SlowWiki()) as server, \
+            HTTPXTransport(server.url) as transport:
+        hedged = HedgedTransport(transport, min_samples=5, max_extra=.5)
+        with API(server.url, transport=hedged) as api:
+            for _ in range(6):
+                api.post({'action': 'query', 'list': 'allpages'})
+        hedged.close()  # waits for the loser
+    assert (hedged.hedges, hedged.wins) == (1, 1)
+    assert len(server.wiki.requests) == 7
+    assert not caplog.records
+
+
+class DroppingWiki(FakeWiki):
+    """Drop the connection instead of answering the 2nd upload request."""
+
+    uploads = 0
+
+    def respond(self, data, files=None):
+        if data.get('action') == 'upload':
+            self.uploads += 1
+            if self.uploads == 2:
+                raise ConnectionAbortedError
+        return super().respond(data, files)
+
+
+class QuietServer(FakeWikiServer):
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@patch('pymw._upload.sleep')
+def test_httpx_transport_errors_are_retried(sleep, tmp_path):
+    importorskip('httpx')
+    (file := tmp_path / 'F.bin').write_bytes(bytes(range(256)) * 40)
+    with QuietServer(DroppingWiki()) as server, \
+            HTTPXTransport(server.url) as transport, \
+            API(server.url, transport=transport) as api:
+        api._user = 'U'
+        assert upload_path(api, file, 'F.bin', chunk_size=4096) == {
+            'result': 'Success', 'filename': 'F.bin'}
+        assert server.wiki.stash == {'F.bin.stash': 10240}
+    sleep.assert_called_once_with(1)
@@ -0,0 +1,117 @@
+"""Check that the streaming generators run in bounded memory.
+
+Each generator is driven through a synthetic continuation using a fake
+transport and its peak traced allocation is compared with the one of an
+input ten times smaller. Items of the list responses are shared objects, so
+that only the memory retained by pymw can grow with the input size.
+"""
+from itertools import islice
+from tracemalloc import get_traced_memory, start, stop
+
+from pymw import API
+
+PER_RESPONSE = 5000
+ITEM = {'pageid': 1, 'ns': 0, 'title': 'P'}
+# peak allocation that may not be exceeded, regardless of the input size
+BUDGET = 2_000_000
+
+
+class Response:
+    __slots__ = '_json', 'headers'
+
+    def __init__(self, json: dict):
+        self._json = json
+        self.headers = {}
+
+    def json(self):
+        return self._json
+
+
+def list_transport(total: int):
+    """Answer `list=allpages` continuations with `total` shared items."""
+    def post(*, data, params=None, files=None) -> Response:
+        offset = int(data.get('apcontinue', 0))
+        json = {'batchcomplete': True, 'query': {
+            'allpages': [ITEM] * min(PER_RESPONSE, total - offset)}}
+        if (offset := offset + PER_RESPONSE) < total:
+            json['continue'] = {'apcontinue': offset, 'continue': '-||'}
+        return Response(json)
+    return post
+
+
+def prop_transport(*, data, params=None, files=None) -> Response:
+    """Answer `prop=links` in two continued responses for each batch."""
+    titles = data['titles'].split('|')
+    second = 'plcontinue' in data
+    json = {'query': {'pages': [{
+        'ns': 0, 'title': title,
+        'links': [{'ns': 0, 'title': 'L2' if second else 'L1'}],
+    } for title in titles]}}
+    if second:
+        json['batchcomplete'] = True
+    else:
+        json['continue'] = {'plcontinue': 'x', 'continue': '||'}
+    return Response(json)
+
+
+def peak(consume, transport, n: int) -> int:
+    api = API('https://www.mediawiki.org/w/api.php')
+    api._post = transport(n) if transport is list_transport else transport
+    start()
+    try:
+        consume(api, n)
+        return get_traced_memory()[1]
+    finally:
+        stop()
+        api.close()
+
+
+def assert_bounded(consume, transport, n: int):
+    small = peak(consume, transport, n // 10)
+    large = peak(consume, transport, n)
+    assert large < BUDGET, large
+    # allow some noise, but not growth with the input size
+    assert large < small * 1.5 + 100_000, (small, large)
+
+
+def consume_post_and_continue(api: API, n: int):
+    count = 0
+    for json in api.post_and_continue({
+        'action': 'query', 'list': 'allpages', 'aplimit': 'max'
+    }):
+        count += len(json['query']['allpages'])
+    assert count == n
+
+
+def consume_list(api: API, n: int):
+    assert sum(1 for _ in api.list('allpages', {'aplimit': 'max'})) == n
+
+
+def consume_prop(api: API, n: int):
+    titles = (f'P{i}' for i in range(n))  # a lazy limited param
+    count = 0
+    for page in api.prop('links', {'titles': titles}):
+        assert len(page['links']) == 2
+        count += 1
+    assert count == n
+
+
+def test_post_and_continue_memory():
+    assert_bounded(consume_post_and_continue, list_transport, 2_000_000)
+
+
+def test_list_memory():
+    assert_bounded(consume_list, list_transport, 2_000_000)
+
+
+def test_prop_memory():
+    assert_bounded(consume_prop, prop_transport, 50_000)
+
+
+def test_unbounded_consumer_is_detected():
+    def retain(api: API, n: int):
+        [*islice(api.list('allpages', {'aplimit': 'max'}), n)]
+
+    small = peak(retain, list_transport, 20_000)
+    large = peak(retain, list_transport, 200_000)
+    assert large > small * 5
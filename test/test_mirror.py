@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+from pytest import raises
+
+from pymw import API, PageMirror, PYMWError
+
+
+api = API('https://www.mediawiki.org/w/api.php')
+
+
+def info(pageid, title, lastrevid, ns=0):
+    return {
+        'pageid': pageid, 'ns': ns, 'title': title, 'lastrevid': lastrevid,
+        'length': lastrevid * 10, 'touched': f'2020-01-0{lastrevid}T00:00:00Z'}
+
+
+def test_load_and_update():
+    mirror = PageMirror(api)
+    with raises(PYMWError):
+        mirror.update()
+
+    with patch.object(API, 'list', return_value=iter((
+        {'timestamp': '2020-01-01T00:00:00Z'},))
+    ), patch.object(API, 'prop', return_value=iter((
+        info(1, 'A', 1), info(2, 'B', 1), info(3, 'C', 1)))
+    ) as prop:
+        assert mirror.load() == 3
+    prop.assert_called_once_with(
+        'info', {'generator': 'allpages', 'gaplimit': 'max'})
+    assert mirror.rcstart == '2020-01-01T00:00:00Z'
+    assert mirror.get('A') == info(1, 'A', 1)
+
+    recentchanges = (
+        {'type': 'edit', 'pageid': 1, 'title': 'A',
+         'timestamp': '2020-01-02T00:00:00Z'},
+        {'type': 'log', 'pageid': 0, 'title': 'B', 'logtype': 'delete',
+         'timestamp': '2020-01-02T00:00:00Z'},
+        {'type': 'log', 'pageid': 3, 'title': 'C', 'logtype': 'move',
+         'logparams': {'target_ns': 0, 'target_title': 'D'},
+         'timestamp': '2020-01-03T00:00:00Z'})
+
+    def prop_info(_, __, params):
+        if 'pageids' in params:
+            assert params['pageids'] == ['1']
+            yield info(1, 'A', 2)
+            return
+        assert sorted(params['titles']) == ['B', 'C', 'D']
+        yield {'ns': 0, 'title': 'B', 'missing': True}
+        yield info(4, 'C', 3)  # redirect
+        yield info(3, 'D', 3)
+
+    with patch.object(API, 'list', return_value=iter(recentchanges)) as rc, \
+            patch.object(API, 'prop', prop_info):
+        assert mirror.update() == 4
+    assert rc.call_args.args[1]['rcstart'] == '2020-01-01T00:00:00Z'
+    assert mirror.rcstart == '2020-01-03T00:00:00Z'
+    assert len(mirror) == 3
+    assert mirror.get('A') == info(1, 'A', 2)
+    assert mirror.get('B') is None
+    assert mirror.get('C') == info(4, 'C', 3)
+    assert mirror.get_by_id(3) == info(3, 'D', 3)
+
+
+def test_persistence(tmp_path):
+    path = tmp_path / 'mirror.sqlite'
+    with PageMirror(api, path) as mirror, \
+            patch.object(API, 'list', return_value=iter(())), \
+            patch.object(API, 'prop', return_value=iter((info(1, 'A', 1),))):
+        mirror.load({'gapnamespace': 0})
+    with PageMirror(api, path) as mirror:
+        assert mirror.get_by_id(1) == info(1, 'A', 1)
+        assert mirror.rcstart is None
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from time import sleep
+
+from pytest import raises
+
+from pymw import PYMWError, pipeline
+
+
+def square(x):
+    if x == 'fail':
+        raise ValueError(x)
+    return x * x
+
+
+def slow_first(x):
+    if x == 0:
+        sleep(.5)
+    return x
+
+
+def test_ordered():
+    assert [*pipeline(square, range(100), processes=2, batch_size=7)] == [
+        x * x for x in range(100)]
+
+
+def test_as_completed():
+    results = [*pipeline(
+        slow_first, range(20), processes=2, ordered=False)]
+    assert sorted(results) == [*range(20)]
+    assert results[0] != 0  # did not wait for the slow first item
+
+
+def test_backpressure():
+    consumed = []
+
+    def items():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    with ThreadPoolExecutor(2) as executor:
+        results = pipeline(
+            square, items(), max_pending=3, batch_size=2, executor=executor)
+        assert [*islice(results, 2)] == [0, 1]
+        sleep(.2)
+        # one yielded batch, three pending ones, and one waiting for a slot
+        assert len(consumed) <= 10
+        results.close()
+
+
+def test_errors():
+    with raises(ValueError):
+        [*pipeline(square, [1, 'fail', 3], processes=2)]
+
+    def items():
+        yield from (1, 2)
+        raise PYMWError('fetch failed')
+
+    results = pipeline(square, items(), processes=2)
+    assert next(results) == 1
+    assert next(results) == 4
+    with raises(PYMWError, match='fetch failed'):
+        next(results)
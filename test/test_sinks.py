@@ -0,0 +1,64 @@
+from io import StringIO
+from json import loads
+
+from pytest import importorskip
+
+from pymw import write_csv, write_ndjson, write_parquet
+
+
+items = [
+    {'pageid': 1, 'ns': 0, 'title': 'A'},
+    {'pageid': 2, 'ns': 0, 'title': 'É', 'redirect': True},
+    {'ns': 0, 'title': 'C'}]
+
+
+class FlushCounter(StringIO):
+
+    flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_write_ndjson():
+    file = FlushCounter()
+    assert write_ndjson(iter(items), file, batch_size=2) == 3
+    assert file.flushes == 2
+    assert [loads(line) for line in file.getvalue().splitlines()] == items
+    assert 'É' in file.getvalue()
+
+
+def test_write_ndjson_empty():
+    file = FlushCounter()
+    assert write_ndjson(iter(()), file) == 0
+    assert file.getvalue() == ''
+    assert file.flushes == 0
+
+
+def test_write_csv():
+    file = FlushCounter(newline='')
+    assert write_csv(items, file, ('pageid', 'title'), batch_size=2) == 3
+    assert file.flushes == 2
+    assert file.getvalue() == 'pageid,title\r\n1,A\r\n2,É\r\n,C\r\n'
+
+
+def test_write_parquet(tmp_path):
+    parquet = importorskip('pyarrow.parquet')
+    path = tmp_path / 'items.parquet'
+    assert write_parquet(items, path, batch_size=2) == 3
+    assert parquet.read_table(path).to_pylist() == [
+        {'pageid': 1, 'ns': 0, 'title': 'A', 'redirect': None},
+        {'pageid': 2, 'ns': 0, 'title': 'É', 'redirect': True},
+        {'pageid': None, 'ns': 0, 'title': 'C', 'redirect': None}]
+    assert write_parquet(items, path, fields=('title', 'pageid')) == 3
+    assert parquet.read_table(path).to_pylist() == [
+        {'title': 'A', 'pageid': 1}, {'title': 'É', 'pageid': 2},
+        {'title': 'C', 'pageid': None}]
+
+
+def test_write_per_response():
+    file = FlushCounter()
+    responses = [items[:2], [], items[2:]]  # e.g. one list per response
+    assert write_ndjson(iter(responses), file, batch_size=None) == 3
+    assert file.flushes == 2
+    assert [loads(line) for line in file.getvalue().splitlines()] == items
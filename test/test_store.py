@@ -0,0 +1,97 @@
+from hashlib import sha1
+from unittest.mock import patch
+
+from pymw import API, ContentDir, RevisionStore, revision_slots
+
+
+api = API('https://www.mediawiki.org/w/api.php')
+
+
+def revisions_response(*contents):
+    return {'batchcomplete': True, 'query': {'pages': [{
+        'pageid': 1, 'ns': 0, 'title': 'A', 'revisions': [
+            {'revid': i, 'slots': {'main': {'content': content}}}
+            for i, content in enumerate(contents, 1)]}]}}
+
+
+def test_revision_slots():
+    json = revisions_response('a')
+    json['query']['pages'] += [
+        {'pageid': 2, 'revisions': [{'revid': 3, 'content': 'b'}]},
+        {'pageid': 3, 'missing': True},
+        {'pageid': 4, 'revisions': [{'revid': 4}]}]
+    assert [(p['pageid'], r['revid'], role, slot) for p, r, role, slot in
+            revision_slots(json)] == [
+        (1, 1, 'main', {'content': 'a'}),
+        (2, 3, 'main', {'revid': 3, 'content': 'b'})]
+    assert [*revision_slots({})] == []
+
+
+def test_content_dir_prop(tmp_path):
+    content_dir = ContentDir(tmp_path)
+    digest = sha1('α'.encode()).hexdigest()
+    with patch.object(
+            API, 'post', return_value=revisions_response('α', 'α')):
+        page, = api.prop('revisions', {}, content_dir=content_dir)
+    path = str(tmp_path / digest[:2] / digest)
+    assert page['revisions'] == [
+        {'revid': 1, 'slots': {'main': {
+            'contentsha1': digest, 'contentpath': path}}},
+        {'revid': 2, 'slots': {'main': {
+            'contentsha1': digest, 'contentpath': path}}}]
+    assert content_dir.read(digest) == 'α'
+    assert [*tmp_path.glob('*/*')] == [tmp_path / digest[:2] / digest]
+
+
+def test_revision_store(tmp_path):
+    path = tmp_path / 'revisions.sqlite'
+    with RevisionStore(path) as store:
+        store.add(revisions_response('a', 'b'))
+        store.put(1, 'changed?')  # revisions are immutable
+        assert store.get(1) == 'a'
+        assert store.get(3) is None
+        assert store.get(1, 'mediainfo') is None
+    with RevisionStore(path) as store:
+        assert len(store) == 2
+        assert store.get(2) == 'b'
+        assert store.hit_rate == 1
+
+
+def test_revisions_cache_first():
+    store = RevisionStore()
+    store.put(1, 'a')
+    store.put(3, 'c')
+
+    def post(data):
+        assert data['revids'] == ('2', '4')
+        return {'batchcomplete': True, 'query': {
+            'badrevids': {'4': {'revid': 4, 'missing': True}},
+            'pages': [{'pageid': 1, 'revisions': [
+                {'revid': 2, 'slots': {'main': {'content': 'b'}}}]}]}}
+
+    with patch.object(API, 'post', side_effect=post) as post_mock:
+        assert dict(api.revisions((1, 2, '3', 4), store=store)) == {
+            1: 'a', 2: 'b', 3: 'c'}
+    post_mock.assert_called_once()
+    assert store.get(2) == 'b'  # written back
+    assert store.hits == 3 and store.misses == 2
+    assert store.hit_rate == .6
+
+
+def test_revisions_batches():
+    api.limit = 2
+    posted = []
+
+    def post(data):
+        posted.append(data['revids'])
+        return {'batchcomplete': True, 'query': {'pages': [{'revisions': [
+            {'revid': int(r), 'slots': {'main': {'texthidden': True}}}
+            for r in data['revids']]}]}}
+
+    try:
+        with patch.object(API, 'post', side_effect=post):
+            assert [*api.revisions(range(5))] == [
+                (0, None), (1, None), (2, None), (3, None), (4, None)]
+    finally:
+        api.limit = 50
+    assert posted == [('0', '1'), ('2', '3'), ('4',)]
@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from pymw import API, TitleNormalizer
+
+
+siteinfo = {
+    'general': {'case': 'first-letter'},
+    'namespaces': {
+        '-1': {'id': -1, 'case': 'first-letter', 'name': 'Special',
+               'canonical': 'Special'},
+        '0': {'id': 0, 'case': 'first-letter', 'name': ''},
+        '2': {'id': 2, 'case': 'first-letter', 'name': 'Kullanıcı',
+              'canonical': 'User'},
+        '4': {'id': 4, 'case': 'first-letter', 'name': 'Vikipedi',
+              'canonical': 'Project'},
+        '828': {'id': 828, 'case': 'case-sensitive', 'name': 'Modül',
+                'canonical': 'Module'}},
+    'namespacealiases': [{'id': 4, 'alias': 'VP'}, {'id': 2, 'alias': 'U'}]}
+normalize = TitleNormalizer(siteinfo)
+
+
+def test_main_namespace():
+    assert normalize('foo_bar') == 'Foo bar'
+    assert normalize('  foo  _bar ') == 'Foo bar'
+    assert normalize(':foo#section') == 'Foo'
+    assert normalize('no namespace: here') == 'No namespace: here'
+    assert normalize('') == ''
+
+
+def test_namespaces():
+    assert normalize('user:foo') == 'Kullanıcı:Foo'
+    assert normalize('kullanıcı : foo_bar') == 'Kullanıcı:Foo bar'
+    assert normalize('vp:x') == 'Vikipedi:X'
+    assert normalize('project:x') == 'Vikipedi:X'
+    assert normalize('module:x') == 'Modül:x'
+    assert normalize('modül: x') == 'Modül:x'
+
+
+@patch.object(API, 'meta', return_value=siteinfo)
+def test_from_api(meta):
+    api = API('https://tr.wikipedia.org/w/api.php')
+    assert TitleNormalizer.from_api(api)('u:x') == 'Kullanıcı:X'
+    meta.assert_called_once_with(
+        'siteinfo', {'siprop': 'general|namespaces|namespacealiases'})
+
+
+def test_dedupe_titles_before_chunking():
+    api = API('https://tr.wikipedia.org/w/api.php')
+    api.limit = 2
+    api.title_normalizer = normalize
+    posted = []
+    with patch.object(
+            API, 'post', side_effect=lambda d: posted.append(d['titles']) or {}):
+        for _ in api.post_and_continue({
+                'action': 'query', 'titles': 'a|A|b|user:a|Kullanıcı:A|c'}):
+            pass
+    assert posted == [('A', 'B'), ('Kullanıcı:A', 'C')]
@@ -0,0 +1,130 @@
+from gzip import open as gzip_open
+from json import loads
+from threading import Lock
+from time import sleep
+from unittest.mock import patch
+
+from pytest import raises
+
+from fakewiki import FakeResponse, FakeWiki
+from pymw import API, APIError, HedgedTransport, PYMWError, Recorder, \
+    Replayer
+
+
+def record(path):
+    wiki = FakeWiki()
+    wiki.page_count = 25
+    wiki.maxlag_every = 3
+    with API('https://www.mediawiki.org/w/api.php', transport=wiki) as api, \
+            Recorder(api.transport, path) as api.transport:
+        pages = [*api.list('allpages', {'aplimit': 10})]
+        assert api.tokens['csrf'] == '+\\'
+    return pages, wiki
+
+
+@patch('pymw._api.sleep')
+def test_record_and_replay(_, tmp_path):
+    path = tmp_path / 'run.jsonl.gz'
+    pages, wiki = record(path)
+    assert len(wiki.requests) == 5  # including one maxlag error
+    replayer = Replayer(path)
+    assert len(replayer) == 5
+    with API('https://example.org/w/api.php', transport=replayer) as api:
+        assert [*api.list('allpages', {'aplimit': 10})] == pages
+        assert api.tokens['csrf'] == '+\\'
+        assert api.last_response.request.body
+        assert len(replayer) == 0
+        with raises(PYMWError):
+            api.tokens.pop('csrf')
+            api.tokens['csrf']
+
+
+@patch('pymw._api.sleep')
+def test_replay_latency(_, tmp_path):
+    path = tmp_path / 'run.jsonl.gz'
+    record(path)
+    with patch('pymw._transport.sleep') as sleep:
+        api = API('https://example.org/w/api.php')
+        api.transport = Replayer(path, latency=True)
+        [*api.list('allpages', {'aplimit': 10})]
+    assert sleep.call_count == 4
+    assert all(c.args[0] >= 0 for c in sleep.call_args_list)
+
+
+def test_secrets_are_not_recorded(tmp_path):
+    path = tmp_path / 'run.jsonl.gz'
+    api = API('https://www.mediawiki.org/w/api.php', transport=FakeWiki())
+    with Recorder(api.transport, path) as api.transport, raises(APIError):
+        api.post({'action': 'edit', 'title': 'T', 'text': 'X'})
+    with gzip_open(path, 'rt') as f:
+        requests = [loads(line)['request'] for line in f]
+    assert requests[1] == (
+        'action=edit&errorformat=plaintext&format=json&formatversion=2'
+        '&maxlag=5&text=X&title=T')
+
+
+class SlowTransport:
+    """Answer immediately, except for the calls in `slow`."""
+
+    def __init__(self, slow=()):
+        self.slow = {*slow}
+        self.calls = 0
+        self.closed = []
+        self.lock = Lock()
+
+    def __call__(self, *, data, params=None, files=None):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call in self.slow:
+            sleep(.5)
+        resp = ClosableResponse({'call': call})
+        resp.closed = self.closed
+        return resp
+
+
+class ClosableResponse(FakeResponse):
+
+    def close(self):
+        self.closed.append(self._json['call'])
+
+
+def hedged_api(transport, **kwargs):
+    return API('https://www.mediawiki.org/w/api.php', transport=(
+        HedgedTransport(transport, min_samples=5, **kwargs)))
+
+
+def test_hedged_request():
+    transport = SlowTransport(slow={6})
+    with hedged_api(transport, max_extra=.5) as api:
+        hedged = api.transport
+        for _ in range(5):
+            api.post({'action': 'query'})
+        assert hedged.delay is not None and hedged.delay < .5
+        assert api.post({'action': 'query'}) == {'call': 7}  # the hedge
+        assert (hedged.requests, hedged.hedges, hedged.wins) == (6, 1, 1)
+        hedged.close()
+    assert transport.closed == [6]  # the loser
+
+
+def test_hedging_is_capped():
+    transport = SlowTransport(slow={6, 7})
+    with hedged_api(transport, max_extra=.1) as api:
+        for _ in range(5):
+            api.post({'action': 'query'})
+        assert api.post({'action': 'query'}) == {'call': 6}
+        assert api.transport.hedges == 0
+
+
+def test_writes_are_never_hedged():
+    transport = SlowTransport(slow={7})
+    with hedged_api(transport, actions=('query', 'edit'), max_extra=1) \
+            as api:
+        assert api.transport.actions == {'query'}
+        for _ in range(5):
+            api.post({'action': 'query'})
+        api.tokens['csrf'] = 'T'
+        api.post({'action': 'edit', 'title': 'T', 'text': ''})
+        api.post({'action': 'parse', 'text': ''})
+        assert transport.calls == 7
+        assert api.transport.requests == 5
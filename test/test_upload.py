@@ -0,0 +1,184 @@
+from hashlib import sha1
+from threading import Lock
+from unittest.mock import patch
+
+from pytest import fixture, raises
+from requests import ConnectionError
+
+from pymw import API, APIError, bulk_upload, file_sha1, upload_path
+
+
+@fixture
+def api():
+    api = API('https://commons.wikimedia.org/w/api.php')
+    api._user = 'U'
+    return api
+
+
+@fixture
+def file(tmp_path):
+    (file := tmp_path / 'F.bin').write_bytes(bytes(range(256)) * 40)
+    return file
+
+
+class FakeStash:
+
+    def __init__(self, failures=(), async_=False):
+        self.stashed = bytearray()
+        self.requests = []
+        self.failures = [*failures]
+        self.async_ = async_
+
+    def __call__(self, data, files=None):
+        self.requests.append(data.copy())
+        if self.failures and (failure := self.failures.pop(0)):
+            raise failure
+        if 'checkstatus' in data:
+            return {'result': 'Success', 'filekey': 'K'}
+        if files is None:  # commit
+            if self.async_:
+                return {'result': 'Poll', 'stage': 'queued'}
+            return {'result': 'Success', 'filename': data['filename']}
+        assert data['offset'] == len(self.stashed)
+        self.stashed += files['chunk'][1]
+        if len(self.stashed) < data['filesize']:
+            return {
+                'result': 'Continue', 'offset': len(self.stashed),
+                'filekey': 'K'}
+        if self.async_:
+            return {'result': 'Poll', 'stage': 'queued', 'filekey': 'K'}
+        return {'result': 'Success', 'filekey': 'K'}
+
+
+@patch('pymw._upload.sleep')
+def test_upload_path(sleep, api, file):
+    stash = FakeStash(failures=(None, ConnectionError()))
+    state = {}
+    with patch.object(API, 'upload', stash):
+        result = upload_path(
+            api, file, 'F.bin', state=state, chunk_size=4096,
+            min_chunk_size=1024, comment='C')
+    assert result == {'result': 'Success', 'filename': 'F.bin'}
+    assert stash.stashed == file.read_bytes()
+    assert state == {'filekey': 'K', 'offset': 10240}
+    # the failed chunk was retried, then the chunk size was doubled
+    assert [(r.get('offset'), r.get('filekey')) for r in stash.requests] == [
+        (0, None), (4096, 'K'), (4096, 'K'), (None, 'K')]
+    sleep.assert_called_once_with(1)
+    assert stash.requests[-1] == {
+        'filename': 'F.bin', 'ignorewarnings': None, 'filekey': 'K',
+        'comment': 'C'}
+
+
+def test_resume_upload_path(api, file):
+    stash = FakeStash()
+    stash.stashed += file.read_bytes()[:5000]
+    with patch.object(API, 'upload', stash):
+        upload_path(
+            api, file, 'F.bin', state={'filekey': 'K', 'offset': 5000})
+    assert stash.stashed == file.read_bytes()
+    assert [r.get('offset') for r in stash.requests] == [5000, None]
+
+
+@patch('pymw._upload.sleep')
+def test_async_upload_path(sleep, api, file):
+    stash = FakeStash(async_=True)
+    with patch.object(API, 'upload', stash):
+        assert upload_path(
+            api, file, 'F.bin', async_=True, poll_interval=3
+        ) == {'result': 'Success', 'filekey': 'K'}
+    assert [(r.get('async'), r.get('checkstatus')) for r in stash.requests] \
+        == [(1, None), (None, 1), (1, None), (None, 1)]
+    assert sleep.call_count == 2
+
+
+def test_non_retriable_error(api, file):
+    stash = FakeStash(failures=(APIError([{'code': 'fileexists-forbidden'}]),))
+    with patch.object(API, 'upload', stash), raises(APIError):
+        upload_path(api, file, 'F.bin')
+    assert len(stash.requests) == 1
+
+
+def test_file_sha1(file):
+    assert file_sha1(file, 1000) == sha1(file.read_bytes()).hexdigest()
+
+
+def test_bulk_upload(api, tmp_path):
+    contents = {
+        'Same.bin': b'same', 'Changed.bin': b'new', 'Dup.bin': b'dup',
+        'New.bin': b'new file', 'Big.bin': b'b' * 3000, 'Bad.bin': b'bad'}
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+    wiki = {
+        'File:Sa me.bin': sha1(b'same').hexdigest(),
+        'File:Changed.bin': sha1(b'old').hexdigest(),
+        'File:Big.bin': sha1(b'old big').hexdigest(),
+        'File:Other.bin': sha1(b'dup').hexdigest()}
+    lock = Lock()
+    uploads = []
+
+    def post(_, data, files=None):
+        if data['action'] == 'query' and 'prop' in data:
+            assert len(titles := data['titles']) <= 4  # batch_size
+            normalized, pages = [], []
+            for title in titles:
+                if '_' in title:
+                    normalized.append({
+                        'from': title, 'to': (title := title.replace(
+                            '_', ' '))})
+                pages.append({'title': title, 'missing': True} if (
+                    digest := wiki.get(title)) is None else {
+                    'title': title, 'imageinfo': [{'sha1': digest}]})
+            return {'batchcomplete': True, 'query': {
+                'normalized': normalized, 'pages': pages}}
+        if data['action'] == 'query':
+            return {'batchcomplete': True, 'query': {'allimages': [
+                {'name': title[5:]} for title, digest in wiki.items()
+                if digest == data['aisha1']]}}
+        with lock:
+            uploads.append((data.copy(), files and bytes(files[
+                'file' if 'file' in files else 'chunk'][1])))
+        if data['filename'] == 'Bad.bin':
+            raise APIError([{'code': 'verification-error'}])
+        if 'stash' in data:
+            if (offset := data['offset'] + len(files['chunk'][1])) < \
+                    data['filesize']:
+                return {'upload': {
+                    'result': 'Continue', 'offset': offset, 'filekey': 'K'}}
+            return {'upload': {'result': 'Success', 'filekey': 'K'}}
+        if f"File:{data['filename']}" in wiki \
+                and not data.get('ignorewarnings'):
+            return {'upload': {'result': 'Warning', 'warnings': {
+                'exists': data['filename']}}}
+        return {'upload': {'result': 'Success'}}
+
+    with patch.object(API, 'post', post):
+        reports = [*bulk_upload(
+            api, ((tmp_path / name, name.replace('Same', 'Sa_me'))
+                  for name in contents),
+            workers=2, processes=2, batch_size=4, chunk_size=2048,
+            comment='C')]
+    by_name = {r['filename']: r for r in reports}
+    assert len(reports) == 6
+    assert by_name['Sa_me.bin']['status'] == 'unchanged'
+    assert by_name['Changed.bin']['status'] == 'uploaded'
+    assert by_name['Changed.bin']['previous_sha1'] == sha1(b'old').hexdigest()
+    assert by_name['Dup.bin'] | {'sha1': None} == {
+        'path': str(tmp_path / 'Dup.bin'), 'filename': 'Dup.bin',
+        'sha1': None, 'status': 'duplicate', 'duplicates': ['Other.bin']}
+    assert by_name['New.bin']['status'] == 'uploaded'
+    assert by_name['Big.bin']['status'] == 'uploaded'
+    assert by_name['Bad.bin']['status'] == 'failed'
+    assert by_name['Bad.bin']['error'].code == 'verification-error'
+    uploaded = {d['filename'] for d, _ in uploads}
+    assert uploaded == {'Changed.bin', 'New.bin', 'Big.bin', 'Bad.bin'}
+    assert (
+        {'comment': 'C', 'filename': 'New.bin', 'action': 'upload'},
+        b'new file') in uploads
+    assert (
+        {'comment': 'C', 'filename': 'Changed.bin', 'ignorewarnings': 1,
+         'action': 'upload'}, b'new') in uploads
+    assert [d['ignorewarnings'] for d, c in uploads
+            if d['filename'] == 'Big.bin' and c is None] == [1]
+    assert b''.join(c for d, c in uploads if d['filename'] == 'Big.bin'
+                    and c) == b'b' * 3000